@@ -8,6 +8,18 @@ from scipy import ndimage
 from mibidata import constants
 
 
+# The order in which (chroma, x, 0) are assigned to (R, G, B) for each of the
+# six hue sectors. The small dtype keeps the per-pixel index arrays compact.
+_HSL_SECTOR_ORDER = np.array([
+    [0, 1, 2],
+    [1, 0, 2],
+    [2, 0, 1],
+    [2, 1, 0],
+    [1, 2, 0],
+    [0, 2, 1],
+], dtype=np.int8)
+
+
 def _trim(array, lower=0., upper=1.):
     """Trims an array to a specified range; used for floating point errors."""
     return np.minimum(np.maximum(array, lower), upper)
@@ -79,46 +91,53 @@ def hsl2rgb(hsl):
         HSL_and_HSV. Wikipedia: The Free Encyclopedia. Accessed 09/11/2016.
             http://en.wikipedia.org/wiki/HSL_and_HSV.
     """
-    if np.any(hsl < 0.):
+    # Reduce each layer to its extrema once rather than building a boolean
+    # array for every bound that is checked.
+    if hsl.size:
+        minima = hsl.min(axis=(0, 1))
+        maxima = hsl.max(axis=(0, 1))
+    else:
+        minima = maxima = np.zeros(3)
+    if np.any(minima < 0.):
         raise ValueError('Input array must have values with hue in the '
                          'interval [0, 2*pi] and saturation and luminosity in '
                          'the interval [0, 1], but this array has minimum %s.'
-                         % hsl.min())
-    if np.any(hsl[:, :, 1:] > 1.):
+                         % minima.min())
+    if np.any(maxima[1:] > 1.):
         raise ValueError('Input array must have values of saturation and '
                          'luminosity in the interval [0, 1], but this array '
                          'has maximum saturation and luminosity of %s.'
-                         % hsl[:, :, 1:].max())
-    if np.any(hsl[:, :, 0] > 2 * np.pi):
+                         % maxima[1:].max())
+    if maxima[0] > 2 * np.pi:
         raise ValueError('Input array must have values with hue in the '
                          'interval [0, 2*pi] and saturation and luminosity in '
                          'the interval [0, 1], but this array has maximum '
-                         'hue of %s.' % hsl[:, :, 0].max())
-
-    chroma = (1 - np.abs(2 * hsl[:, :, 2] - 1)) * hsl[:, :, 1]
+                         'hue of %s.' % maxima[0])
+
+    # The intermediate layers are computed in place to avoid allocating a
+    # temporary array for each arithmetic step.
+    chroma = 2 * hsl[:, :, 2]
+    chroma -= 1
+    np.abs(chroma, out=chroma)
+    np.subtract(1, chroma, out=chroma)
+    chroma *= hsl[:, :, 1]
     # H is in [0, 2*pi], thus Hprime is in [0, 6]
-    hue_prime = 3 * hsl[:, :, 0] / np.pi
-    x = chroma * (1 - np.abs(np.mod(hue_prime, 2) - 1))
-    # assign bin 1-6 for hue_prime where bin i is [i-1, i]
-    sector = np.digitize(hue_prime, range(7))
+    hue_prime = 3 * hsl[:, :, 0]
+    hue_prime /= np.pi
+    x = np.mod(hue_prime, 2)
+    x -= 1
+    np.abs(x, out=x)
+    np.subtract(1, x, out=x)
+    x *= chroma
+    # assign sector 0-5 for hue_prime where sector i is [i, i + 1), wrapping
+    # a hue of 2*pi around to sector 0
+    sector = np.floor(hue_prime).astype(np.int8) % 6
     cxz = np.stack((chroma, x, np.zeros_like(x)), axis=2)
-    rgb = np.zeros_like(hsl)
-
-    def rgb_sector(ind, order):
-        idx = sector == ind
-        ar = cxz[:, :, order]
-        rgb[idx, :] = ar[idx, :]
-
-    rgb_sector(1, [0, 1, 2])
-    rgb_sector(2, [1, 0, 2])
-    rgb_sector(3, [2, 0, 1])
-    rgb_sector(4, [2, 1, 0])
-    rgb_sector(5, [1, 2, 0])
-    rgb_sector(6, [0, 2, 1])
-
-    match_value = hsl[:, :, 2] - chroma / 2
-    for i in range(3):
-        rgb[:, :, i] += match_value
+    rgb = np.take_along_axis(cxz, _HSL_SECTOR_ORDER[sector], axis=2)
+
+    chroma /= 2
+    np.subtract(hsl[:, :, 2], chroma, out=chroma)
+    rgb += chroma[:, :, np.newaxis]
     np.clip(rgb, 0., 1., out=rgb)
 
     return rgb
@@ -186,20 +205,30 @@ def composite(image, color_map, gamma=1/3, min_scaling=10):
     Returns:
         An NxMx3 uint8 array of an RGB image.
     """
-    overlay = None
+    # Screening layers is equivalent to 1 - (1 - a) * (1 - b) * ..., so the
+    # complement of the overlay is accumulated in place as a running product.
+    inverse_overlay = None
+    array = None
+    layer = None
     for key, val in color_map.items():
-        array = np.power(  # pylint: disable=assignment-from-no-return
-            image[val] / np.maximum(np.max(image[val]), min_scaling),
-            gamma)
-        rgb = (
-            np.stack((array, array, array), axis=2) *
-            constants.COLORS[key]
-        )
-        if overlay is None:
-            overlay = rgb
-        else:
-            overlay = _porter_duff_screen(overlay, rgb)
-    return np.uint8(overlay * 255)
+        channel = image[val]
+        # Scale by the reciprocal into a buffer reused for every channel.
+        scale = 1 / max(channel.max(), min_scaling)
+        array = np.multiply(channel, scale, out=array)
+        np.power(array, gamma, out=array)
+        if inverse_overlay is None:
+            inverse_overlay = np.multiply(
+                array[:, :, np.newaxis], constants.COLORS[key])
+            np.subtract(1, inverse_overlay, out=inverse_overlay)
+            continue
+        # Later layers are also formed in a single reused RGB buffer.
+        layer = np.multiply(
+            array[:, :, np.newaxis], constants.COLORS[key], out=layer)
+        np.subtract(1, layer, out=layer)
+        inverse_overlay *= layer
+    np.subtract(1, inverse_overlay, out=inverse_overlay)
+    inverse_overlay *= 255
+    return np.uint8(inverse_overlay)
 
 
 def compose_overlay(image, overlay_settings):
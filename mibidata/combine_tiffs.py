@@ -3,14 +3,18 @@
 Copyright (C) 2021 Ionpath, Inc.  All rights reserved."""
 
 import argparse
+import collections
 import datetime
+import functools
 import os
 import re
 
 import numpy as np
 from skimage import io as skio
 
-from mibidata import mibi_image as mi, panels, runs, tiff
+from mibidata import mibi_image as mi, panels, runs, tiff, util
+
+_TIFF_EXTENSIONS = {'.tif', '.tiff'}
 
 
 def _load_single_channel(file_name):
@@ -24,10 +28,20 @@ def _load_single_channel(file_name):
     return array
 
 
+@functools.lru_cache(maxsize=8)
+def _index_tiff_filenames(filenames):
+    """Maps the lowercase name of each TIFF, minus extension, to its files."""
+    index = collections.defaultdict(list)
+    for f in filenames:
+        name, extension = os.path.splitext(f.lower())
+        if extension in _TIFF_EXTENSIONS:
+            index[name].append(f)
+    return index
+
+
 def _match_target_filename(filenames, target):
     """Finds the file whose name matches target, target.tif, or target.tiff"""
-    pattern = re.compile(r'{}\.tiff?$'.format(re.escape(target).lower()))
-    matches = [f for f in filenames if re.match(pattern, f.lower())]
+    matches = _index_tiff_filenames(tuple(filenames)).get(target.lower(), [])
     try:
         assert len(matches) == 1
     except AssertionError:
@@ -98,7 +112,7 @@ def create_mibitiffs(input_folder, run_path, point, panel_path, slide, size,
     except IndexError:
         raise IndexError('{} not found in run xml.'.format(point))
     if fov['date']:
-        run_date = datetime.datetime.strptime(
+        run_date = util.parse_datetime(
             fov['date'], '%Y-%m-%dT%H:%M:%S').date()
     else:
         run_date = datetime.datetime.now().date()
@@ -2,13 +2,15 @@
 
 Copyright (C) 2021 Ionpath, Inc.  All rights reserved."""
 
-import datetime
+import itertools
 import os
 import warnings
 
 import numpy as np
 from skimage import io as skio, transform
 
+from mibidata import util
+
 # The format of the run xml.
 _DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
 # The attributes to include in the metadata dictionary.
@@ -19,6 +21,8 @@ SPECIFIED_METADATA_ATTRIBUTES = ('date', 'run', 'coordinates', 'size', 'slide',
                                  'time_resolution', 'miscalibrated',
                                  'check_reg', 'filename', 'description',
                                  'version')
+# Replaces characters that are reserved in filenames on common platforms.
+_FILENAME_TRANSLATION = str.maketrans(dict.fromkeys('/\\:*?"<>|', '-'))
 
 
 
@@ -49,7 +53,12 @@ class MibiImage():
 
     Args:
         data: An MxMxD numpy array of multiplexed image data, where D is
-            the channel index and the frame size of the image is MxM.
+            the channel index and the frame size of the image is MxM. The
+            image stores the data with each channel contiguous in memory, so
+            an array in any other layout is copied, and the image does not
+            share memory with it. The ``data`` property returns an MxMxD view
+            of that storage, which is not C-contiguous, so reshaping or
+            raveling it makes a copy.
         channels: A tuple of channel names of length D. The names may
             either be strings, or tuples of strings of the format (mass,
             target).
@@ -172,21 +181,21 @@ class MibiImage():
         self._aperture = None
         date = kwargs.pop('date', None)
         datetime_format = kwargs.pop('datetime_format', _DATETIME_FORMAT)
-        try:
-            self.date = datetime.datetime.strptime(date, datetime_format)
-        except TypeError:  # Given as datetime obj already, or None.
+        if isinstance(date, str):
+            self.date = util.parse_datetime(date, datetime_format)
+        else:  # Given as datetime obj already, or None.
             self.date = date
 
         for attr in SPECIFIED_METADATA_ATTRIBUTES[1:]:
             setattr(self, attr, kwargs.pop(attr, None))
 
-        # empty list for storing user-defined attribute names
-        self._user_defined_attributes = []
+        # insertion-ordered dict used as a set of user-defined attribute names
+        self._user_defined_attributes = {}
 
         # whatever remains (if anything) is user-defined metadata
         for k, v in kwargs.items():
             setattr(self, k, v)
-            self._user_defined_attributes.append(k)
+            self._user_defined_attributes[k] = None
 
     def add_attr(self, **kwargs):
         """Adds user-defined metadata key-value pairs as attributes to
@@ -212,7 +221,7 @@ class MibiImage():
                                      f'already attributes for this instance.')
             raise ValueError(already_def_error)
         for key, value in kwargs.items():
-            self._user_defined_attributes.append(key)
+            self._user_defined_attributes[key] = None
             setattr(self, key, value)
 
 
@@ -252,7 +261,21 @@ class MibiImage():
             raise ValueError(required_error)
         for attr in attributes:
             delattr(self, attr)
-            self._user_defined_attributes.remove(attr)
+            del self._user_defined_attributes[attr]
+
+    @property
+    def data(self):
+        """An MxMxD numpy array of multiplexed image data.
+
+        The data are stored with each channel contiguous in memory, and this
+        is a view of that array with the channel index on the last axis.
+        """
+        return self._data.transpose(1, 2, 0)
+
+    @data.setter
+    def data(self, values):
+        """Stores the MxMxD data with each channel contiguous in memory."""
+        self._data = np.ascontiguousarray(np.moveaxis(values, 2, 0))
 
     @property
     def pixel_size(self):
@@ -353,24 +376,34 @@ class MibiImage():
         self._set_channels(values, self._length)
 
     def _set_channels(self, channels, length):
-        if len(set(channels)) != length:
+        # The lookup dicts double as the uniqueness checks: any duplicate
+        # label collapses into a single key.
+        channels = tuple(channels)
+        channel_index = {c: i for i, c in enumerate(channels)}
+        if len(channel_index) != length:
             raise ValueError('Channels are not all unique.')
         if all((isinstance(c, tuple) and len(c) == 2 for c in channels)):
             # Tuples of masses and targets.
             masses, targets = zip(*channels)
-            if len(set(masses)) != length:
+            mass_index = {m: i for i, m in enumerate(masses)}
+            if len(mass_index) != length:
                 raise ValueError('Masses are not all unique.')
-            if len(set(targets)) != length:
+            target_index = {t: i for i, t in enumerate(targets)}
+            if len(target_index) != length:
                 raise ValueError('Targets are not all unique.')
             self.masses = masses
             self.targets = targets
+            self._mass_index = mass_index
+            self._target_index = target_index
         elif all(isinstance(c, str) for c in channels):
             self.masses = self.targets = None
+            self._mass_index = self._target_index = {}
         else:
             raise ValueError(
                 'Channels must be a list of tuples of (int, str) or a '
                 'list of str')
-        self._channels = tuple(channels)
+        self._channels = channels
+        self._channel_index = channel_index
 
     def __eq__(self, other):
         """Checks for equality between MibiImage instances.
@@ -381,11 +414,15 @@ class MibiImage():
         Returns: True if both the values of the data array and the metadata of
             the other MibiImage are equal to this instance's; otherwise False.
         """
+        if self is other:
+            return True
         if isinstance(other, self.__class__):
-            return (self.metadata() == other.metadata() and
-                    self.channels == other.channels and
+            # Compare the cheap attributes first; np.array_equal also returns
+            # early if the shapes differ.
+            return (self.channels == other.channels and
                     self.data.dtype == other.data.dtype and
-                    np.all(self.data == other.data))
+                    self.metadata() == other.metadata() and
+                    np.array_equal(self.data, other.data))
         return False
 
     def __getitem__(self, channels):
@@ -441,10 +478,10 @@ class MibiImage():
 
     def metadata(self):
         """Returns a dictionary of the image's metadata."""
-        metadata_keys = list(SPECIFIED_METADATA_ATTRIBUTES)
-        # find user-defined metadata
-        metadata_keys.extend(self._user_defined_attributes)
-        return {key: getattr(self, key) for key in metadata_keys}
+        # The date is parsed once on construction, so this only reads the
+        # specified attributes followed by any user-defined ones.
+        return {key: getattr(self, key) for key in itertools.chain(
+            SPECIFIED_METADATA_ATTRIBUTES, self._user_defined_attributes)}
 
     def channel_inds(self, channels):
         """Returns the indices of the specified channels on the data's 2nd axis.
@@ -460,43 +497,35 @@ class MibiImage():
             KeyError: Raised if channels are not all found in image.
         """
         try:
-            return self._channels.index(channels)
-        except ValueError:
-            pass
-        try:
-            return self.targets.index(channels)
-        except (ValueError, AttributeError):
-            pass
-        try:
-            return self.masses.index(channels)
-        except (ValueError, AttributeError):
-            pass
-        try:
-            return [self._channels.index(i) for i in channels]
-        except ValueError:
+            for index in (self._channel_index, self._target_index,
+                          self._mass_index):
+                if channels in index:
+                    return index[channels]
+        except TypeError:  # Unhashable sequence of labels.
             pass
-        try:
-            return [self.masses.index(i) for i in channels]
-        except (ValueError, AttributeError):
-            pass
-        try:
-            return [self.targets.index(i) for i in channels]
-        except (ValueError, AttributeError):
-            if self.targets is None:
-                error_msg = f'Cannot match {channels}. Channels were indexed ' \
-                    f'with targets only (no masses were given), available ' \
-                    f'targets are {self._channels}'
-            else:
-                error_msg = f'Subset of channels, targets or massses not ' \
-                    f'found matching {channels}, available targets are ' \
-                    f'{self._channels}'
-            raise KeyError(error_msg)
+        for index in (self._channel_index, self._mass_index,
+                      self._target_index):
+            try:
+                return [index[i] for i in channels]
+            except (KeyError, TypeError):
+                pass
+        if self.targets is None:
+            error_msg = f'Cannot match {channels}. Channels were indexed ' \
+                f'with targets only (no masses were given), available ' \
+                f'targets are {self._channels}'
+        else:
+            error_msg = f'Subset of channels, targets or massses not ' \
+                f'found matching {channels}, available targets are ' \
+                f'{self._channels}'
+        raise KeyError(error_msg)
 
     def slice_data(self, channels):
         """Selects a subset of data from the MibiImage given selected channels.
 
         If a single channel is given, the third dimension will be
         stripped and an actual slice of the array will be returned, not a copy.
+        Since each channel is stored contiguously, this slice is a contiguous
+        array.
 
         If a sequence of channels is given, even if it is a sequence of
         length 1, a copy will be returned.
@@ -511,7 +540,10 @@ class MibiImage():
         Returns:
             A numpy array containing the data sliced from the image.
         """
-        return self.data[:, :, self.channel_inds(channels)]
+        inds = self.channel_inds(channels)
+        if np.ndim(inds):
+            return self._data[inds].transpose(1, 2, 0)
+        return self._data[inds]
 
     def slice_image(self, channels):
         """Returns a MibiImage from slicing channels of another MibiImage.
@@ -541,7 +573,8 @@ class MibiImage():
         Returns:
             A MibiImage instance with a copy of the data and channels.
         """
-        return MibiImage(self.data.copy(), self.channels[:], **self.metadata())
+        return MibiImage(self._data.copy().transpose(1, 2, 0),
+                         self.channels[:], **self.metadata())
 
     def append(self, image):
         """Appends another MibiImage's data and channels.
@@ -572,10 +605,12 @@ class MibiImage():
             if not all(isinstance(c, str) for c in image.channels):
                 raise ValueError('Channels to be appended must match form of '
                                  'original image, which is a list of str.')
-        self._set_channels(
-            [c for c in self.channels] + [c for c in image.channels],
-            len(self.channels) + len(image.channels))
-        self.data = np.concatenate((self.data, image.data), axis=2)
+        channels = self._channels + image.channels
+        self._set_channels(channels, len(channels))
+        self._length = len(channels)
+        # Channels are contiguous blocks, so this is a single copy of each.
+        self._data = np.concatenate(
+            (self._data, np.moveaxis(image.data, 2, 0)), axis=0)
 
     def remove_channels(self, channels, copy=False):
         """Removes specified channels from a MibiImage.
@@ -593,7 +628,8 @@ class MibiImage():
             image.
         """
         # np.delete does not alter the input array
-        new_data = np.delete(self.data, self.channel_inds(channels), 2)
+        new_data = np.delete(
+            self._data, self.channel_inds(channels), 0).transpose(1, 2, 0)
         delete_inds = self.channel_inds(channels)
         new_channels = [
             c for c in self.channels if self.channel_inds(c) not in delete_inds]
@@ -649,10 +685,27 @@ class MibiImage():
             dtype = float
 
         def _resize():
-            return transform.resize(
-                self.data, (size[0], size[1], shape[2]), order=3,
-                mode='edge', preserve_range=True,
-                anti_aliasing=False).astype(dtype)
+            if not np.issubdtype(dtype, np.floating):
+                # The interpolated values are truncated to integers, where
+                # even floating point error can change a value by one, so the
+                # full array is resized at once to keep the results exact.
+                return transform.resize(
+                    self.data, (size[0], size[1], shape[2]), order=3,
+                    mode='edge', preserve_range=True,
+                    anti_aliasing=False).astype(dtype)
+            # Resizing each contiguous channel separately avoids also
+            # interpolating along the channel axis of the full array. The
+            # result is clipped to the range of the whole image, as it would
+            # be when resizing all channels at once.
+            data_range = self._data.min(), self._data.max()
+            resized = np.empty((shape[2], size[0], size[1]), dtype)
+            for i, channel in enumerate(self._data):
+                resized[i] = np.clip(
+                    transform.resize(
+                        channel, (size[0], size[1]), order=3, mode='edge',
+                        preserve_range=True, anti_aliasing=False, clip=False),
+                    *data_range)
+            return resized.transpose(1, 2, 0)
 
         if copy:
             return MibiImage(_resize(), self.channels, **self.metadata())
@@ -694,11 +747,12 @@ class MibiImage():
         dmax = data.max()
         if (data.dtype in (np.uint8, np.uint16, bool) or
                 np.issubdtype(data.dtype, np.integer)):
-            # save as uint8 or uint 16 if already in those ranges
+            # save as uint8 or uint 16 if already in those ranges; the values
+            # are cast directly, and not copied if already of that type
             if dmin >= 0 and dmax < 2 ** 8:
-                converter = lambda array: array.astype(np.uint8)
+                converter = lambda array: array.astype(np.uint8, copy=False)
             elif dmin >= 0 and dmax < 2 ** 16:
-                converter = lambda array: array.astype(np.uint16)
+                converter = lambda array: array.astype(np.uint16, copy=False)
             else:
                 raise TypeError(
                     'Data are integers outside of uint16 range. You must '
@@ -709,7 +763,7 @@ class MibiImage():
         for i, label in enumerate(self.channels):
             im = converter(data[:, :, i])
             png_name = (label[1] if isinstance(label, tuple) else label
-                       ).replace('/', '-')  # / isn't safe for filenames
+                       ).translate(_FILENAME_TRANSLATION)
             with warnings.catch_warnings():
                 warnings.filterwarnings('ignore',
                                         message='.*low contrast image.*')
@@ -2,6 +2,10 @@
 
 Copyright (C) 2021 Ionpath, Inc.  All rights reserved."""
 
+import functools
+import io
+import os
+
 import numpy as np
 import pandas as pd
 from pandas.errors import ParserError
@@ -12,29 +16,32 @@ def read_csv(path):
     """Reads a panel CSV file into a dataframe.
 
     Args:
-        path: The path to the CSV file.
+        path: The path to the CSV file, or a text file-like object.
 
     Returns:
         A dataframe containing columns 'Mass' and 'Target'.
     """
+    if hasattr(path, 'read'):
+        # A buffer can only be read once, so keep its contents and parse each
+        # section of the CSV from a fresh in-memory buffer.
+        contents = path.read()
+        source = functools.partial(io.StringIO, contents)
+    else:
+        source = functools.partial(os.fspath, path)
     try:
         # First try if the CSV is simply Mass,Target,
-        df = pd.read_csv(path, encoding='utf-8')
+        df = pd.read_csv(source(), encoding='utf-8')
         # CSV may parse successfully but not have proper columns
         if not {'Mass', 'Target'}.issubset(set(df.columns)):
             raise ParserError
         return merge_masses(df)
     except ParserError:
-        # Determine lines that indicate a table header line
-        header_lines = []
-        with open(path, 'rt', encoding='utf-8') as f:
-            line_pos = 0
-            for line in f:
-                if 'Mass' in line and 'Target' in line:
-                    header_lines.append(line_pos)
-                line_pos += 1
-
-        last_line = line_pos
+        if hasattr(path, 'read'):
+            header_lines, last_line = _scan_header_lines(contents)
+        else:
+            stat = os.stat(path)
+            header_lines, last_line = _find_header_lines(
+                os.path.realpath(path), stat.st_mtime_ns, stat.st_size)
 
         # Determine start and end lines for each batch in file
         df = []
@@ -46,10 +53,13 @@ def read_csv(path):
             except IndexError:
                 end = last_line
 
-            batch = pd.read_csv(path, skiprows=start,
-                                skipfooter=(last_line - end),
-                                engine='python',
-                                encoding='utf-8')[['Mass', 'Target']]
+            # Counting blank lines as rows keeps nrows aligned with the file's
+            # line numbers, which lets the C parser stop at the batch end.
+            batch = pd.read_csv(source(), skiprows=start,
+                                nrows=(end - start - 1),
+                                skip_blank_lines=False,
+                                usecols=['Mass', 'Target'],
+                                encoding='utf-8')
 
             # Remove empty rows if they exist
             df.append(batch.dropna())
@@ -61,12 +71,53 @@ def read_csv(path):
         return merge_masses(combined)
 
 
+@functools.lru_cache(maxsize=128)
+def _find_header_lines(path, mtime_ns, size):  # pylint: disable=unused-argument
+    """Finds the table header lines and the line count of a tracker CSV.
+
+    The modification time and size are only part of the cache key, so that
+    a file rewritten in place is scanned again.
+    """
+    with open(path, 'rt', encoding='utf-8') as f:
+        return _scan_header_lines(f.read())
+
+
+def _scan_header_lines(text):
+    """Finds the table header lines and the line count of a CSV's contents."""
+    # Jump between occurrences of 'Target' with str.find rather than testing
+    # every line, counting the newlines skipped over to get line numbers.
+    header_lines = []
+    line_pos = 0
+    counted = 0
+    index = text.find('Target')
+    while index != -1:
+        line_start = text.rfind('\n', 0, index) + 1
+        line_end = text.find('\n', index)
+        if line_end == -1:
+            line_end = len(text)
+        line_pos += text.count('\n', counted, line_start)
+        counted = line_start
+        if 'Mass' in text[line_start:line_end]:
+            header_lines.append(line_pos)
+        index = text.find('Target', line_end)
+    num_lines = text.count('\n') + (bool(text) and not text.endswith('\n'))
+    return tuple(header_lines), num_lines
+
+
+def _join_targets(targets):
+    """Joins the targets sharing a mass in natural sort order."""
+    target_list = list(targets)
+    util.natural_sort(target_list)
+    return ', '.join(target_list)
+
+
 def merge_masses(df):
     """Merges 'Target' cells of a DataFrame with the same 'Mass' value.
 
     This function merges multiple targets that are conjugated to the same mass
     tag such that the returned DataFrame contains only unique masses. Target
     names are combined using the conventions of :func:'util.natural_sort()'.
+    Rows with a missing mass are never merged.
 
     Args:
         df: A DataFrame of the panel containing columns 'Mass' and
@@ -76,17 +127,10 @@ def merge_masses(df):
         A DataFrame containing columns 'Mass' and 'Target' with merged targets
         of the same mass.
     """
-    conjugates = {}
-    target_list = []
-    for conj in df.to_dict(orient='records'):
-        mass = conj['Mass']
-        target = conj['Target']
-        if conjugates.get(mass):
-            conjugates[mass].append(target)
-        else:
-            conjugates[mass] = [target]
-    for mass in conjugates:
-        target_list = conjugates[mass]
-        util.natural_sort(target_list)
-        conjugates[mass] = ', '.join(target_list)
-    return pd.DataFrame(list(conjugates.items()), columns=['Mass', 'Target'])
+    keys = pd.factorize(df['Mass'])[0]
+    # A missing mass never matches another, so each one keeps its own row.
+    missing = keys < 0
+    keys[missing] = -1 - np.arange(np.count_nonzero(missing))
+    return df.groupby(keys, sort=False).agg(
+        Mass=('Mass', 'first'),
+        Target=('Target', _join_targets)).reset_index(drop=True)
@@ -2,10 +2,12 @@
 
 Copyright (C) 2021 Ionpath, Inc.  All rights reserved."""
 
-# pylint: disable=too-many-branches
+# pylint: disable=too-many-branches,too-many-statements
 
 import argparse
+from concurrent import futures
 import glob
+import mmap
 import os
 import shutil
 import struct
@@ -19,6 +21,32 @@ SAT_ENTRY_SIZE = 10
 SAT_ENTRY_FORMAT = 'qH'
 DATA_SIZE = 4
 DATA_FORMAT = 'HH'
+# Record layouts equivalent to SAT_ENTRY_FORMAT and DATA_FORMAT.
+SAT_DTYPE = np.dtype([('offset', 'q'), ('length', 'H')])
+DATA_DTYPE = np.dtype([('timestamp', 'H'), ('count', 'H')])
+# Per-pixel writes are small, so buffer output to reduce write syscalls.
+WRITE_BUFFER_SIZE = 1 << 20
+# Number of pixels whose spectra are accumulated before each depth's output
+# is handed to the writer threads.
+WRITE_BATCH_PIXELS = 1024
+
+
+def _write_batch(pool, handles, batch):
+    """Writes each depth's accumulated spectra to its handle in parallel.
+
+    Args:
+        pool: A ThreadPoolExecutor used to write to the handles concurrently.
+        handles: A list of open file handles, one per pseudo-depth.
+        batch: A list of the same length as handles, where each item is a list
+            of arrays to be written to the corresponding handle. The lists are
+            emptied once written.
+    """
+    jobs = [pool.submit(handle.write, b''.join(chunks))
+            for handle, chunks in zip(handles, batch)]
+    for job in futures.as_completed(jobs):
+        job.result()
+    for chunks in batch:
+        chunks.clear()
 
 
 def divide(msdf_file, num_scans, path=None):
@@ -59,77 +87,99 @@ def divide(msdf_file, num_scans, path=None):
     for i in range(num_scans):
         folder = os.path.join(path, f'Depth{i}')
         os.makedirs(folder)
-        handles.append(open(os.path.join(folder, 'Image.msdf'), 'wb'))
+        handles.append(open(os.path.join(folder, 'Image.msdf'), 'wb',
+                            buffering=WRITE_BUFFER_SIZE))
 
+    # Arrays viewing the memory-mapped input; see the finally clause below.
+    sat = pixel = depths = depth = None
+    batch = [[] for _ in handles]
+    mm = None
     try:
+        # The map keeps its own file descriptor, so the file can be closed.
         with open(msdf_file, 'rb') as infile:
-            header = infile.read(HEADER_SIZE)
-            file_variant, _, num_spectra = struct.unpack(HEADER_FORMAT, header)
-            try:
-                assert file_variant == 1
-            except AssertionError:
-                raise ValueError('Invalid input Image.msdf file.')
-            for handle in handles:
-                handle.write(header)
-            # Adding a dimension to the SAT for each psuedo-depth, since
-            # splitting them up will require creating a new SAT for each.
-            depth_sat = np.zeros((num_spectra, 2, num_scans), int)
-            buffer = infile.read(SAT_ENTRY_SIZE * num_spectra)
-            sat = np.array(
-                [i for i in struct.iter_unpack(SAT_ENTRY_FORMAT, buffer)],
-                int)
-            # Skip after to after SAT in new files; will update it later.
-            after_sat = infile.tell()
-            for handle in handles:
-                handle.seek(after_sat)
-
-            # Get cycles per pixel to calculate cycles per pseudo-depth.
-            pixel = np.fromfile(
-                infile, count=2 * sat[0, 1], dtype=np.ushort)[1::2]
-            cycles_per_pixel = np.count_nonzero(pixel)
-            if not cycles_per_pixel:
-                raise ValueError(
-                    'Cycle start indicators were not found in this file. '
-                    'Please confirm that this file was created by MiniSIMS '
-                    '>=6.3.4.0 with the "Encode ToF Cycle Start" option '
-                    'selected.')
-            cycles_per_scan, remainder = np.divmod(cycles_per_pixel, num_scans)
-            if remainder:
-                raise ValueError(
-                    'Splitting {0} cycles per pixel into {1} depths does not '
-                    'result in equal division. Please choose a divisor of {0}.'
-                    .format(cycles_per_pixel, cycles_per_scan)
-                )
-            infile.seek(sat[0, 0])
-
-            # Iterate through pixels while writing counts to each pseudo-depth.
+            mm = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        header = mm[:HEADER_SIZE]
+        file_variant, _, num_spectra = struct.unpack(HEADER_FORMAT, header)
+        try:
+            assert file_variant == 1
+        except AssertionError:
+            raise ValueError('Invalid input Image.msdf file.')
+        for handle in handles:
+            handle.write(header)
+        # Adding a dimension to the SAT for each psuedo-depth, since
+        # splitting them up will require creating a new SAT for each.
+        depth_sat = np.zeros((num_spectra, 2, num_scans), int)
+        after_sat = HEADER_SIZE + SAT_ENTRY_SIZE * num_spectra
+        sat = np.frombuffer(
+            mm, dtype=SAT_DTYPE, count=num_spectra, offset=HEADER_SIZE)
+        # Skip after to after SAT in new files; will update it later.
+        for handle in handles:
+            handle.seek(after_sat)
+
+        # Get cycles per pixel to calculate cycles per pseudo-depth.
+        pixel = np.frombuffer(
+            mm, dtype=DATA_DTYPE, count=sat[0]['length'],
+            offset=sat[0]['offset'])
+        cycles_per_pixel = np.count_nonzero(pixel['count'])
+        if not cycles_per_pixel:
+            raise ValueError(
+                'Cycle start indicators were not found in this file. '
+                'Please confirm that this file was created by MiniSIMS '
+                '>=6.3.4.0 with the "Encode ToF Cycle Start" option '
+                'selected.')
+        cycles_per_scan, remainder = np.divmod(cycles_per_pixel, num_scans)
+        if remainder:
+            raise ValueError(
+                'Splitting {0} cycles per pixel into {1} depths does not '
+                'result in equal division. Please choose a divisor of {0}.'
+                .format(cycles_per_pixel, cycles_per_scan)
+            )
+
+        # Iterate through pixels while writing counts to each pseudo-depth.
+        # The output files are independent, so each batch of pixels is
+        # written to all of them concurrently; offsets for the new SATs are
+        # tracked here since the handles are not written to in lockstep.
+        offsets = np.full(num_scans, after_sat, int)
+        with futures.ThreadPoolExecutor(max_workers=num_scans) as pool:
             for i in tqdm.tqdm(range(num_spectra)):
-                depth_sat[i, 0, :] = [handle.tell() for handle in handles]
-                # Nx2 array of bins and counts for this pixel
-                pixel = np.fromfile(infile, count=2*sat[i, 1], dtype=np.ushort
-                                   ).reshape((sat[i, 1], 2))
-                # splits zero-events (cycle boundaries) into list of n
-                idx = np.split(np.where(pixel[:, 1] == 0)[0], num_scans)
-                # gets index of end of each pseudo-depth
-                boundaries = [i[-1] + 1 for i in idx[:-1]]
-                # splits array into list of sub-arrays using boundary indices
-                depths = np.split(pixel, boundaries, axis=0)
+                depth_sat[i, 0, :] = offsets
+                # Records of bins and counts for this pixel, read
+                # directly from the memory-mapped file without a copy.
+                offset, length = sat[i]
+                pixel = np.frombuffer(
+                    mm, dtype=DATA_DTYPE, count=length, offset=offset)
+                # groups zero-events (cycle boundaries) into n rows, the
+                # last of each marking the end of a pseudo-depth
+                boundaries = np.flatnonzero(pixel['count'] == 0).reshape(
+                    (num_scans, -1))[:-1, -1] + 1
+                # splits array into list of sub-arrays using boundary
+                # indices
+                depths = np.split(pixel, boundaries)
                 for j, depth in enumerate(depths):
-                    handles[j].write(depth)
+                    batch[j].append(depth)
                     depth_sat[i, 1, j] = len(depth)
+                offsets += DATA_SIZE * depth_sat[i, 1, :]
+                if not (i + 1) % WRITE_BATCH_PIXELS:
+                    _write_batch(pool, handles, batch)
+            _write_batch(pool, handles, batch)
 
         # Go back and write the new SAT for each file now that we know how
         # many entries there are for each pixel in each new pseudo-depth.
+        new_sat = np.empty(num_spectra, SAT_DTYPE)
         for h, handle in enumerate(handles):
+            new_sat['offset'] = depth_sat[:, 0, h]
+            new_sat['length'] = depth_sat[:, 1, h]
             handle.seek(HEADER_SIZE)
-            for i in range(num_spectra):
-                handle.write(struct.pack(
-                    SAT_ENTRY_FORMAT,
-                    depth_sat[i, 0, h], depth_sat[i, 1, h]
-                ))
+            handle.write(new_sat.tobytes())
     finally:
         for handle in handles:
             handle.close()
+        # The map cannot be closed while any arrays still view it.
+        sat = pixel = depths = depth = None
+        for chunks in batch:
+            chunks.clear()
+        if mm is not None:
+            mm.close()
 
     return cycles_per_pixel, cycles_per_scan
 
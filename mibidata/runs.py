@@ -2,6 +2,7 @@
 
 Copyright (C) 2021 Ionpath, Inc.  All rights reserved."""
 
+import functools
 import os
 import re
 import xml.etree.ElementTree as ElementTree
@@ -22,17 +23,47 @@ def parse_xml(path):
         fovs: A list of image metadata dicts for each FOV.
         calibration: A dict containing mass calibration parameters.
     """
+    stat = os.stat(path)
+    fovs, calibration = _parse_xml(
+        os.path.realpath(path), stat.st_mtime_ns, stat.st_size)
+    # The run is named after the path as given, which may be a link. Copy the
+    # cached results so that callers are free to modify them.
     run = os.path.splitext(os.path.split(path)[1])[0]
+    return [dict(fov, run=run) for fov in fovs], dict(calibration)
+
+
+@functools.lru_cache(maxsize=32)
+def _parse_xml(path, mtime_ns, size):  # pylint: disable=unused-argument
+    """Parses a run XML; the modification time and size only key the cache.
+
+    The run name is left as None for parse_xml to fill in.
+    """
     fovs = []
     calibration = {}
-    tree = ElementTree.parse(path)
-    calibration['RasterStyle'] = tree.getroot().attrib.get('RasterStyle')
-    runtime = tree.find('./Root').attrib.get('RunTime')
-    # Hack for when run has crashed midway through and datetime is unavailable.
-    if runtime == '0001-01-01T00:00:00':
-        runtime = None
-    for j, point in enumerate(tree.findall('./Root/Point'), 1):
-        number = 'Point{}'.format(j)
+    runtime = None
+    found_root = False
+    num_points = 0
+    # Stream the XML, tracking the path of open tags, so that each Point is
+    # discarded once it is parsed rather than holding the whole run in memory.
+    tags = []
+    for event, point in ElementTree.iterparse(path, events=('start', 'end')):
+        if event == 'start':
+            tags.append(point.tag)
+            if len(tags) == 1:
+                calibration['RasterStyle'] = point.attrib.get('RasterStyle')
+            elif tags[1:] == ['Root'] and not found_root:
+                found_root = True
+                runtime = point.attrib.get('RunTime')
+                # Hack for when run has crashed midway through and datetime is
+                # unavailable.
+                if runtime == '0001-01-01T00:00:00':
+                    runtime = None
+            continue
+        tags.pop()
+        if tags[1:] != ['Root'] or point.tag != 'Point':
+            continue
+        num_points += 1
+        number = 'Point{}'.format(num_points)
         counter = {'Depth_Profile': 0, 'Chemical_Image': 0}
         name = point.attrib.get('PointName')
         for item in point:
@@ -54,7 +85,7 @@ def parse_xml(path):
                     if not param in calibration:
                         calibration[param] = float(item.attrib.get(param))
                 fovs.append({
-                    'run': run,
+                    'run': None,
                     'folder': folder,
                     'dwell': float(item.attrib.get('AcquisitionTime')),
                     'scans': int(item.attrib.get('MaxNumberOfLevels', 1)),
@@ -62,4 +93,5 @@ def parse_xml(path):
                     'point_name': name,
                     'date': runtime,
                 })
+        point.clear()
     return fovs, calibration
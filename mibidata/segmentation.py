@@ -41,36 +41,67 @@ def extract_cell_dataframe(label_image, image=None, mode='total',
         include the area, centroid, and if included the total or scored
         counts of the image's channels within each region.
     """
-    segment_labels = np.unique(label_image)
-    segment_labels = segment_labels[segment_labels > 0]
-
-    columns = ['label', 'area', 'x_centroid', 'y_centroid']
-    if image is not None:
-        columns += list(image.targets or image.channels)
-
-    rows = []
-    for segment_label in segment_labels:
-        region = label_image == segment_label
-        nonzeros = np.nonzero(region)
-
-        row = [segment_label, len(nonzeros[0]), int(round(nonzeros[1].mean())),
-               int(round(nonzeros[0].mean()))]
-        if image is not None:
-            if mode == 'total':
-                vals = image.data[nonzeros[0], nonzeros[1], :].sum(axis=0)
-            elif mode == 'quadrant':
-                vals = _circular_sectors_mean(nonzeros, image, num_sectors=4)
-            elif mode == 'circular_sectors':
-                vals = _circular_sectors_mean(nonzeros, image, num_sectors)
-            else:
-                raise ValueError('"mode" must be either "total", "quadrant" or \
-                "circular_sectors"')
-            row.extend(vals)
-        rows.append(row)
-    return pd.DataFrame(rows, columns=columns).set_index('label')
-
-
-def _circular_sectors_mean(inds, image, num_sectors=8):
+    if image is not None and mode not in ('total', 'quadrant',
+                                          'circular_sectors'):
+        raise ValueError('"mode" must be either "total", "quadrant" or \
+        "circular_sectors"')
+
+    # The areas, centroids and totals of all regions are each accumulated in
+    # one bincount over the flattened labels, rather than region by region.
+    height, width = label_image.shape
+    flat_labels = label_image.ravel().astype(np.intp, copy=False)
+    counts = np.bincount(flat_labels)
+    segment_labels = np.flatnonzero(counts[1:]) + 1
+    areas = counts[segment_labels]
+    # bincount takes its weights as float64, so the pixel coordinates are
+    # generated as float64 to avoid a hidden conversion copy of each.
+    y_centers = np.bincount(
+        flat_labels, np.repeat(np.arange(height, dtype=float), width))[
+            segment_labels] / areas
+    x_centers = np.bincount(
+        flat_labels, np.tile(np.arange(width, dtype=float), height))[
+            segment_labels] / areas
+    df = pd.DataFrame({
+        'area': areas,
+        'x_centroid': np.round(x_centers).astype(int),
+        'y_centroid': np.round(y_centers).astype(int),
+    }, index=pd.Index(segment_labels, name='label'))
+    if image is None:
+        return df
+
+    if mode == 'total':
+        vals = np.stack([
+            np.bincount(flat_labels, image.data[:, :, i].ravel())[
+                segment_labels]
+            for i in range(len(image.channels))], axis=1)
+        # bincount sums in float64; cast back to the dtype np.sum would give,
+        # which restores integer totals exactly.
+        sum_dtype = np.zeros(0, image.data.dtype).sum().dtype
+        vals = vals.astype(sum_dtype, copy=False)
+    else:
+        num_sectors = 4 if mode == 'quadrant' else num_sectors
+        # Group the pixel indices by label with a single stable sort, so that
+        # each region's pixels are a contiguous, row-major run of the order.
+        # The values of all labeled pixels are then gathered in that order in
+        # one pass, and each region reads its own contiguous block of them
+        # along with its already computed center.
+        order = np.argsort(flat_labels, kind='stable')
+        bounds = np.cumsum(counts) - counts[0]
+        y_inds, x_inds = np.divmod(order[counts[0]:], width)
+        pixel_vals = image.data[y_inds, x_inds]
+        vals = np.empty((len(segment_labels), len(image.channels)))
+        for i, segment_label in enumerate(segment_labels):
+            region = slice(bounds[segment_label - 1], bounds[segment_label])
+            vals[i] = _circular_sectors_mean(
+                (y_inds[region], x_inds[region]), image, num_sectors,
+                vals=pixel_vals[region], center=(y_centers[i], x_centers[i]))
+    return pd.concat((df, pd.DataFrame(
+        vals, columns=list(image.targets or image.channels), index=df.index)),
+                     axis=1)
+
+
+def _circular_sectors_mean(inds, image, num_sectors=8, vals=None,
+                           center=None):
     """Divide a region in circular sectors and get the geometric mean across the
     sectors.
 
@@ -79,35 +110,110 @@ def _circular_sectors_mean(inds, image, num_sectors=8):
             segmented region of an image.
         image: A MibiImage in which the corresponding pixel indices are located.
         num_sectors: number of circular sectors to use. Optional, default is 8.
+        vals: Optionally, the image values at inds, of shape
+            (num_pixels_in_cell, num_channels), if they are already gathered.
+        center: Optionally, the (y, x) mean of inds, if it is already known.
 
     Returns:
         An array whose length is equal to the number of channels in the image.
         Each value in the array is the geometric mean of the image's integrated
         channel intensities over the regions's num_sectors circular sectors.
     """
-    # calculate the geometric center of the cells and get the counts
-    y_center, x_center = np.mean(inds, axis=1)
-    vals = image.data[inds]  # has shape (num_pixels_in_cell, num_channels)
+    # get the counts
+    if vals is None:
+        vals = image.data[inds]  # has shape (num_pixels_in_cell, num_channels)
+
+    # assign each pixel to the sector whose [start, end) angles contain it,
+    # so that all channels are summed per sector in one pass
+    y_inds, x_inds = np.asarray(inds[0]), np.asarray(inds[1])
+    if num_sectors in (4, 8) and np.issubdtype(y_inds.dtype, np.integer):
+        # offsets from the center scaled by the number of pixels are exact
+        # integers, which place every pixel off the sector boundaries without
+        # any trigonometry
+        num_pixels = len(y_inds)
+        dx = x_inds * num_pixels - x_inds.sum()
+        dy = y_inds * num_pixels - y_inds.sum()
+        sectors = _axis_aligned_sectors(dx, dy, num_sectors)
+        # pixels on an axis or diagonal are binned by their floating point
+        # angle instead, which decides which side of the boundary they fall on
+        boundary = (dx == 0) | (dy == 0)
+        if num_sectors == 8:
+            boundary |= np.abs(dx) == np.abs(dy)
+        if boundary.any():
+            if center is None:
+                center = np.mean(inds, axis=1)
+            sectors[boundary] = _angle_sectors(
+                y_inds[boundary], x_inds[boundary], center, num_sectors)
+    else:
+        # calculate the geometric center of the cells
+        if center is None:
+            center = np.mean(inds, axis=1)
+        sectors = _angle_sectors(y_inds, x_inds, center, num_sectors)
+    in_range = sectors < num_sectors
+    secs = np.zeros((num_sectors, vals.shape[1]))
+    np.add.at(secs, sectors[in_range], vals[in_range])
+    # fill empty sectors with one (neutral element for the multiplication in
+    # the geometric mean); otherwise the whole cell will be set to zero
+    secs[np.bincount(sectors[in_range], minlength=num_sectors) == 0] = 1
+
+    # calculate the geometric mean among the sectors, falling back to log space
+    # for any channel whose product overflows
+    with np.errstate(over='ignore'):
+        means = np.prod(secs, axis=0)
+    np.power(means, 1 / num_sectors, out=means)
+    overflow = np.isinf(means)
+    if overflow.any():
+        means[overflow] = np.exp(np.log(secs[:, overflow]).mean(axis=0))
+    return means
+
+
+def _angle_sectors(y_inds, x_inds, center, num_sectors):
+    """Finds the circular sector of each pixel from its angle about a center.
 
+    Args:
+        y_inds, x_inds: Arrays of the y- and x- indices of the pixels.
+        center: The (y, x) center of the region.
+        num_sectors: The number of circular sectors.
+
+    Returns:
+        An integer array of the sector index of each pixel, where each sector
+        includes its starting angle. Pixels whose angle rounds up to 2 pi are
+        given the index num_sectors and belong to no sector.
+    """
+    y_center, x_center = center
     # convert to polar coordinates: y, x -> phi, r
-    phi = util.car2pol(inds[1], inds[0], x_center, y_center)[1]
-
-    # create circular sectors
-    sectors = []
-    ang_step = 2.*np.pi/num_sectors
-    for i in range(num_sectors):
-        values = vals[(phi >= i*ang_step) & (phi < (i + 1)*ang_step)]
-         # check if the sector is empty; if so, fill one (neutral element for
-         # the multiplication in the geometric mean); otherwise the whole cell
-         # will be set to zero
-        if not values.size:
-            values = np.ones((1, len(image.channels)))
-        new_sector = values.sum(axis=0)
-        sectors.append(new_sector)
-    secs = np.stack(sectors, axis=1)
-
-    # calculate the geometric mean among the sectors
-    return np.power(np.product(secs, axis=1), 1 / num_sectors)
+    phi = util.car2pol(x_inds, y_inds, x_center, y_center)[1]
+    edges = np.arange(num_sectors + 1) * (2.*np.pi/num_sectors)
+    return np.searchsorted(edges, phi, side='right') - 1
+
+
+def _axis_aligned_sectors(dx, dy, num_sectors):
+    """Finds the quadrant or octant of each pixel without any trigonometry.
+
+    The sectors are numbered counterclockwise from the positive x-axis and
+    each includes its starting angle; the center itself falls in sector 0.
+    Only pixels off the axes and diagonals are guaranteed to match
+    :func:`_angle_sectors`, whose floating point angles may round a pixel on
+    a boundary to either side of it.
+
+    Args:
+        dx, dy: Arrays of the pixels' offsets from the region's center, or
+            any common positive multiple of them.
+        num_sectors: Either 4 or 8.
+
+    Returns:
+        An integer array of the sector index of each pixel.
+    """
+    quadrants = np.where(
+        dy > 0, np.where(dx > 0, 0, 1),
+        np.where(dy < 0, np.where(dx >= 0, 3, 2), np.where(dx < 0, 2, 0)))
+    if num_sectors == 4:
+        return quadrants
+    # The second octant of each quadrant begins at its diagonal.
+    abs_dx, abs_dy = np.abs(dx), np.abs(dy)
+    second_half = np.where(quadrants % 2, abs_dx >= abs_dy,
+                           (abs_dy >= abs_dx) & (abs_dy > 0))
+    return 2 * quadrants + second_half
 
 
 def replace_labeled_pixels(label_image, df, columns=None):
@@ -149,15 +255,22 @@ def replace_labeled_pixels(label_image, df, columns=None):
         )
     if columns is None:
         columns = df.columns
-    label_array = np.zeros((label_image.max() + 1, len(columns)),
-                           dtype=label_image.dtype)
-    try:
-        label_array[df.index, :] = df[columns]
-    except IndexError:
+    # The table of values has one row per dataframe label, plus a final row of
+    # zeros for pixels whose label is absent; only a single column of row
+    # indices spans every integer up to the image's max label, so that each
+    # pixel's row is found by a direct lookup.
+    labels = df.index.values
+    max_label = int(label_image.max())
+    if labels.size and (labels.min() < 0 or labels.max() > max_label):
         raise IndexError('The values in the dataframe index do not match those '
                          'in the label image.')
+    label_array = np.zeros((len(labels) + 1, len(columns)),
+                           dtype=label_image.dtype)
+    label_array[:-1, :] = df[columns].values
+    rows = np.full(max_label + 1, len(labels), dtype=np.intp)
+    rows[labels] = np.arange(len(labels))
     columns = [str(i) for i in columns]
-    return mi.MibiImage(label_array[label_image], columns)
+    return mi.MibiImage(label_array[rows[label_image]], columns)
 
 
 def expand_objects(label_image, distance):
@@ -198,15 +311,14 @@ def filter_by_size(label_image, min_size, max_size):
         A new label image, where segments outside of the size range have been
         set to zero, and a dataframe of its labels, centroids and area.
     """
-    df = extract_cell_dataframe(label_image)
-    segment_labels = df.index[(df['area'] >= min_size) &
-                              (df['area'] <= max_size)]
-    new_labels = list(range(1, len(segment_labels) + 1))
-    new_image = replace_labeled_pixels(
-        label_image, pd.DataFrame(new_labels, index=segment_labels))
-    new_df = pd.DataFrame(df.loc[segment_labels, :]).set_index(
-        pd.Index(new_labels, name='label'))
-    return np.squeeze(new_image.data), new_df
+    areas = np.bincount(label_image.ravel().astype(np.intp, copy=False))
+    keep = (areas > 0) & (areas >= min_size) & (areas <= max_size)
+    keep[0] = False
+    # Kept segments are renumbered consecutively from 1 in their original
+    # order, and everything else is mapped to 0.
+    new_labels = (np.cumsum(keep) * keep).astype(label_image.dtype)
+    new_image = new_labels[label_image]
+    return np.squeeze(new_image), extract_cell_dataframe(new_image)
 
 
 def get_adjacency_matrix(label_image):
@@ -246,15 +358,18 @@ def get_adjacency_matrix(label_image):
     # We can now create an image of labeled region boundaries
     labeled_boundaries = ((label_stack > -1).sum(0) > 1) * label_image
 
-    # Finally we create the adjacency_matrix
-    number_of_labels = label_image.max()
-    adjacency_matrix = np.zeros([number_of_labels + 1] * 2)
-    for label_i in range(1, number_of_labels + 1):
-        boundary = labeled_boundaries == label_i
-        boundary_labels = label_stack[:, boundary]
-        label_j, label_count = np.unique(
-            boundary_labels[boundary_labels != -1],
-            return_counts=True)
-        adjacency_matrix[label_i, label_j] = label_count / boundary.sum()
+    # Finally we create the adjacency_matrix by counting, for all boundary
+    # pixels at once, each (pixel label, neighbor label) pair on the stack
+    size = int(label_image.max()) + 1
+    boundary = labeled_boundaries > 0
+    label_i = labeled_boundaries[boundary].astype(int)
+    boundary_labels = label_stack[:, boundary]
+    pairs = (label_i * size + boundary_labels)[boundary_labels != -1]
+    adjacency_matrix = np.bincount(pairs, minlength=size * size).reshape(
+        size, size).astype(float)
+    # and normalize each row by the length of that region's boundary
+    boundary_lengths = np.bincount(label_i, minlength=size)
+    has_boundary = boundary_lengths > 0
+    adjacency_matrix[has_boundary] /= boundary_lengths[has_boundary, None]
 
     return adjacency_matrix
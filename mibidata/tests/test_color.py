@@ -2,6 +2,7 @@
 
 Copyright (C) 2021 Ionpath, Inc.  All rights reserved."""
 
+import os
 import unittest
 
 import numpy as np
@@ -10,53 +11,14 @@ import numpy.testing as npt
 from mibidata import color
 from mibidata.mibi_image import MibiImage
 
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 
-RGB = np.array([[
-    [1., 1., 1.],
-    [0.5, 0.5, 0.5],
-    [0., 0., 0.],
-    [1., 0., 0.],
-    [0.75, 0.75, 0.],
-    [0., 0.5, 0.],
-    [0.5, 1., 1.],
-    [0.5, 0.5, 1.],
-    [0.75, 0.25, 0.75],
-    [0., 1., 0.],
-    [0., 0., 1.],
-    [0.25, 0.25, 0.25]
-]]).reshape(3, 4, 3)
-
-
-HSL = np.array([[
-    [0., 0., 1.],
-    [0., 0., 0.5],
-    [0., 0., 0.],
-    [0., 1., 0.5],
-    [np.pi / 3, 1., 0.375],
-    [2 * np.pi / 3, 1., 0.25],
-    [np.pi, 1., 0.75],
-    [4 * np.pi / 3, 1., 0.75],
-    [5 * np.pi / 3, 0.5, 0.5],
-    [2 * np.pi / 3., 1., 0.5],
-    [4 * np.pi / 3., 1., 0.5],
-    [0., 0., 0.25],
-]]).reshape(3, 4, 3)
-
-
-CYM = np.array([[
-    [1., 1., 1.],
-    [0.5, 0.5, 0.5],
-    [0., 0., 0.],
-    [0., 1., 1.],
-    [0., 0.75, 0.],
-    [0.5, 0.5, 0.],
-    [1., 0.5, 0.5],
-    [1., 0.5, 1.],
-    [0.25, 0.25, 0.75],
-    [1., 1., 0.],
-    [1., 0., 1.],
-    [0.25, 0.25, 0.25]
-]]).reshape(3, 4, 3)
+# A rainbow of 12 colors in each color space, arranged as a 3x4 image:
+# white, gray, black, red, olive, dark green, light cyan, light blue,
+# light magenta, green, blue and dark gray.
+RGB = np.load(os.path.join(DATA_DIR, 'rgb.npy'), mmap_mode='r')
+HSL = np.load(os.path.join(DATA_DIR, 'hsl.npy'), mmap_mode='r')
+CYM = np.load(os.path.join(DATA_DIR, 'cym.npy'), mmap_mode='r')
 
 
 class TestColor(unittest.TestCase):
@@ -82,6 +44,10 @@ class TestColor(unittest.TestCase):
     def test_hsl2rgb_rainbow(self):
         npt.assert_array_almost_equal(color.hsl2rgb(HSL), RGB)
 
+    def test_hsl2rgb_full_hue(self):
+        hsl = np.array([[[2 * np.pi, 1., 0.5]]])
+        npt.assert_array_almost_equal(color.hsl2rgb(hsl), [[[1., 0., 0.]]])
+
     def test_hsl2rgb_out_of_range(self):
         hsl = HSL.copy()
         hsl[:, :, 0] += np.pi / 2
@@ -69,6 +69,24 @@ class TestMibiImage(unittest.TestCase):
         self.assertEqual(image.masses, MASS_LABELS)
         self.assertEqual(image.targets, TARGET_LABELS)
 
+    def test_data_storage(self):
+        data = TEST_DATA.copy()
+        image = mi.MibiImage(data, STRING_LABELS)
+        # Channel-last input is copied into contiguous channels.
+        self.assertFalse(np.shares_memory(image.data, data))
+        data[0, 0, 0] = 100
+        self.assertEqual(image.data[0, 0, 0], 0)
+        self.assertFalse(image.data.flags['C_CONTIGUOUS'])
+        self.assertTrue(image.data[:, :, 1].flags['C_CONTIGUOUS'])
+        # The data property is a view, so writes to it persist.
+        image.data[0, 0, 0] = 200
+        self.assertEqual(image.data[0, 0, 0], 200)
+        # Input that already has contiguous channels is not copied.
+        channels_first = np.ascontiguousarray(np.moveaxis(TEST_DATA, 2, 0))
+        image = mi.MibiImage(
+            channels_first.transpose(1, 2, 0), STRING_LABELS)
+        self.assertTrue(np.shares_memory(image.data, channels_first))
+
     def test_data_channel_length_mismatch(self):
         with self.assertRaises(ValueError):
             mi.MibiImage(TEST_DATA, STRING_LABELS[:2])
@@ -125,7 +143,7 @@ class TestMibiImage(unittest.TestCase):
         self.assertEqual(image.fov_id, OLD_METADATA['folder'].split('/')[0])
         self.assertEqual(image.fov_name, OLD_METADATA['point_name'])
         self.assertEqual(image.point_name, OLD_METADATA['point_name'])
-        self.assertEqual(image._user_defined_attributes, ['point_name'])
+        self.assertEqual(list(image._user_defined_attributes), ['point_name'])
 
     def test_check_fov_id(self):
         image = mi.MibiImage(TEST_DATA, TUPLE_LABELS)
@@ -250,13 +268,13 @@ class TestMibiImage(unittest.TestCase):
     def test_capture_of_user_defined_metadata(self):
         image = mi.MibiImage(TEST_DATA, TUPLE_LABELS, **METADATA,
                              **USER_DEFINED_METADATA)
-        self.assertEqual(image._user_defined_attributes,
+        self.assertEqual(list(image._user_defined_attributes),
                          list(USER_DEFINED_METADATA))
 
     def test_add_user_defined_metadata(self):
         image = mi.MibiImage(TEST_DATA, TUPLE_LABELS, **METADATA)
         image.add_attr(**USER_DEFINED_METADATA)
-        self.assertEqual(image._user_defined_attributes,
+        self.assertEqual(list(image._user_defined_attributes),
                          list(USER_DEFINED_METADATA))
 
     def test_add_existing_metadata(self):
@@ -343,6 +361,13 @@ class TestMibiImage(unittest.TestCase):
         np.testing.assert_array_equal(im.slice_data(['3', '1']),
                                       TEST_DATA[:, :, [2, 0]])
 
+    def test_slice_data_single_channel_is_contiguous_view(self):
+        im = mi.MibiImage(TEST_DATA.copy(), STRING_LABELS)
+        channel = im.slice_data('2')
+        self.assertTrue(channel.flags['C_CONTIGUOUS'])
+        channel[0, 0] = -1
+        self.assertEqual(im.data[0, 0, 1], -1)
+
     def test_slice_empty_list_from_image(self):
         image = mi.MibiImage(TEST_DATA, STRING_LABELS)
         empty_data = image.slice_data([])
@@ -403,6 +428,12 @@ class TestMibiImage(unittest.TestCase):
         np.testing.assert_array_equal(first_image.data, expected.data)
         self.assertEqual(first_image, expected)
 
+    def test_set_channels_after_append(self):
+        image = mi.MibiImage(TEST_DATA[:, :, :2], ['1', '2'])
+        image.append(mi.MibiImage(TEST_DATA[:, :, 2:], ['3']))
+        image.channels = STRING_LABELS[::-1]
+        self.assertEqual(image.channels, STRING_LABELS[::-1])
+
     def test_append_non_unique_channels(self):
         first_image = mi.MibiImage(TEST_DATA, TUPLE_LABELS, **METADATA)
         original_data = np.copy(first_image.data)
@@ -458,13 +489,20 @@ class TestMibiImage(unittest.TestCase):
         np.testing.assert_array_equal(image.data, TEST_DATA)
         self.assertEqual(image.channels, STRING_LABELS)
 
+    def _assert_resized(self, image, expected):
+        """Float data are resized one channel at a time, so the results can
+        differ from resizing the full array at once by floating point error."""
+        self.assertEqual(image.channels, STRING_LABELS)
+        self.assertEqual(image.data.dtype, expected.dtype)
+        np.testing.assert_allclose(image.data, expected, rtol=0, atol=1e-12)
+
     def test_resize_integer_without_copy(self):
         image = mi.MibiImage(np.random.rand(5, 5, 3), STRING_LABELS)
         data = image.data
         image.resize(3)
         expected = transform.resize(
             data, (3, 3, 3), order=3, mode='edge', anti_aliasing=False)
-        self.assertTrue(image == mi.MibiImage(expected, STRING_LABELS))
+        self._assert_resized(image, expected)
 
     def test_resize_tuple_without_copy(self):
         image = mi.MibiImage(np.random.rand(5, 5, 3), STRING_LABELS)
@@ -472,7 +510,7 @@ class TestMibiImage(unittest.TestCase):
         image.resize((3, 3))
         expected = transform.resize(
             data, (3, 3, 3), order=3, mode='edge', anti_aliasing=False)
-        self.assertTrue(image == mi.MibiImage(expected, STRING_LABELS))
+        self._assert_resized(image, expected)
 
     def test_resize_integer_with_copy(self):
         image = mi.MibiImage(np.random.rand(5, 5, 3), STRING_LABELS)
@@ -480,7 +518,7 @@ class TestMibiImage(unittest.TestCase):
         resized = image.resize(3, copy=True)
         expected = transform.resize(
             image.data, (3, 3, 3), order=3, mode='edge', anti_aliasing=False)
-        self.assertTrue(resized == mi.MibiImage(expected, STRING_LABELS))
+        self._assert_resized(resized, expected)
         self.assertTrue(image == image_copy)
 
     def test_resize_preserve_uint_dtype(self):
@@ -494,6 +532,18 @@ class TestMibiImage(unittest.TestCase):
             preserve_range=True).astype(np.uint8)
         self.assertTrue(image == mi.MibiImage(expected, STRING_LABELS))
 
+    def test_resize_preserve_int_dtypes_exactly(self):
+        rng = np.random.default_rng(0)
+        for dtype in (np.uint8, np.uint16, np.int32):
+            for _ in range(50):
+                data = rng.integers(0, 255, (5, 5, 3)).astype(dtype)
+                resized = mi.MibiImage(data, STRING_LABELS).resize(
+                    3, copy=True, preserve_type=True)
+                expected = transform.resize(
+                    data, (3, 3, 3), order=3, mode='edge',
+                    anti_aliasing=False, preserve_range=True).astype(dtype)
+                np.testing.assert_array_equal(resized.data, expected)
+
     def test_resize_preserve_float_dtype(self):
         image = mi.MibiImage(np.random.rand(5, 5, 3), STRING_LABELS)
         data = image.data
@@ -502,15 +552,13 @@ class TestMibiImage(unittest.TestCase):
         # dtype is preserved if the input data are floats in the unit interval.
         expected = transform.resize(
             data, (3, 3, 3), order=3, mode='edge', anti_aliasing=False)
-        self.assertTrue(image == mi.MibiImage(expected, STRING_LABELS))
+        self._assert_resized(image, expected)
 
     def test_resize_to_larger(self):
         image = mi.MibiImage(np.random.rand(5, 5, 3), STRING_LABELS)
-        expected = mi.MibiImage(
-            transform.resize(image.data, (6, 6, 3), order=3, mode='edge'),
-            STRING_LABELS)
+        expected = transform.resize(image.data, (6, 6, 3), order=3, mode='edge')
         image.resize(6)
-        self.assertTrue(image == expected)
+        self._assert_resized(image, expected)
 
     def test_resize_bad_integer_aspect_ratio(self):
         image = mi.MibiImage(np.random.rand(5, 4, 3), STRING_LABELS)
@@ -613,12 +661,12 @@ class TestExportGrayscales(unittest.TestCase):
                 roundtripped, resized.data[:, :, i])
 
     def test_export_with_tuple_channel_names(self):
-        channels = [(1, 'Channel_1'), (2, 'Channel/2')]
-        data = np.random.randint(0, 255, (10, 10, 2)).astype(np.uint16)
+        channels = [(1, 'Channel_1'), (2, 'Channel/2'), (3, 'Channel:3')]
+        data = np.random.randint(0, 255, (10, 10, 3)).astype(np.uint16)
         im = mi.MibiImage(data, channels)
         im.export_pngs(self.test_dir)
         images = [skio.imread(f'{os.path.join(self.test_dir,  label)}.png')
-                  for label in ('Channel_1', 'Channel-2')]
+                  for label in ('Channel_1', 'Channel-2', 'Channel-3')]
         for i, roundtripped in enumerate(images):
             np.testing.assert_array_equal(
                 roundtripped, im.data[:, :, i])
@@ -2,6 +2,8 @@
 
 Copyright (C) 2021 Ionpath, Inc.  All rights reserved."""
 
+import hashlib
+import mmap
 import os
 import struct
 import shutil
@@ -9,6 +11,8 @@ import tempfile
 import unittest
 
 import numpy as np
+import numpy.testing as npt
+from mock import patch
 
 from mibidata import pseudodepths
 
@@ -51,6 +55,15 @@ DEPTH1 = [
 ]
 
 
+def _digest(path):
+    """Returns the SHA-256 digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as infile:
+        for chunk in iter(lambda: infile.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
 class TestMsdf(unittest.TestCase):
 
     @classmethod
@@ -58,24 +71,18 @@ class TestMsdf(unittest.TestCase):
         fh, fn = tempfile.mkstemp()
         cls.msdf = fn
         os.close(fh)
-        sat = np.zeros((NUM_PIXELS, 2), int)
         cls.header = struct.pack(pseudodepths.HEADER_FORMAT, 1, 8, NUM_PIXELS)
+        end_sat = pseudodepths.HEADER_SIZE + \
+            NUM_PIXELS * pseudodepths.SAT_ENTRY_SIZE
+        sat = np.empty(NUM_PIXELS, pseudodepths.SAT_DTYPE)
+        sat['length'] = [len(pixel) for pixel in DATA]
+        sat['offset'] = end_sat + pseudodepths.DATA_SIZE * np.concatenate(
+            ([0], np.cumsum(sat['length'][:-1])))
+        data = np.empty(sum(sat['length']), pseudodepths.DATA_DTYPE)
+        data['timestamp'] = np.concatenate(DATA)
+        data['count'] = data['timestamp'] > 0
         with open(fn, 'wb') as infile:
-            infile.write(cls.header)
-            end_sat = pseudodepths.HEADER_SIZE + \
-                NUM_PIXELS * pseudodepths.SAT_ENTRY_SIZE
-            infile.seek(end_sat)
-            for i, pixel in enumerate(DATA):
-                sat[i, 0] = infile.tell()
-                sat[i, 1] = len(pixel)
-                for timestamp in pixel:
-                    count = int(timestamp > 0)
-                    infile.write(
-                        struct.pack(pseudodepths.DATA_FORMAT, timestamp, count))
-            infile.seek(pseudodepths.HEADER_SIZE)
-            for offset, length in sat:
-                infile.write(
-                    struct.pack(pseudodepths.SAT_ENTRY_FORMAT, offset, length))
+            infile.write(cls.header + sat.tobytes() + data.tobytes())
         cls.data_start = end_sat
 
     def setUp(self):
@@ -88,22 +95,27 @@ class TestMsdf(unittest.TestCase):
     def tearDown(self):
         shutil.rmtree(self.tempdir)
 
-    def _pack_sat(self, depth):
-        sat = b''
-        offset = self.data_start
-        for d in depth:
-            sat += struct.pack(
-                pseudodepths.SAT_ENTRY_FORMAT, offset, len(d))
-            offset += pseudodepths.DATA_SIZE * len(d)
+    def _build_sat(self, depth):
+        sat = np.empty(len(depth), pseudodepths.SAT_DTYPE)
+        sat['length'] = [len(d) for d in depth]
+        sat['offset'] = self.data_start + pseudodepths.DATA_SIZE * \
+            np.concatenate(([0], np.cumsum(sat['length'][:-1])))
         return sat
 
     def _pack_data(self, depth):
-        data = b''
-        for pixel in depth:
-            for i in pixel:
-                data += struct.pack(
-                    pseudodepths.DATA_FORMAT, i, int(i > 0))
-        return data
+        data = np.empty(
+            sum(len(pixel) for pixel in depth), pseudodepths.DATA_DTYPE)
+        data['timestamp'] = np.concatenate(depth)
+        data['count'] = data['timestamp'] > 0
+        return data.tobytes()
+
+    def test_record_dtypes_match_struct_formats(self):
+        sat = np.array([(123456789, 42)], pseudodepths.SAT_DTYPE)
+        self.assertEqual(sat.tobytes(), struct.pack(
+            pseudodepths.SAT_ENTRY_FORMAT, 123456789, 42))
+        data = np.array([(7, 1)], pseudodepths.DATA_DTYPE)
+        self.assertEqual(data.tobytes(), struct.pack(
+            pseudodepths.DATA_FORMAT, 7, 1))
 
     def test_split_into_one(self):
         """If we split into one output file, we should get the same file out.
@@ -114,11 +126,7 @@ class TestMsdf(unittest.TestCase):
         self.assertEqual(cycles_per_scan, 10)
         new_file = os.path.join(self.tempdir, 'Depth0', 'Image.msdf')
         self.assertTrue(os.path.exists(new_file))
-        with open(self.msdf, 'rb') as infile:
-            expected_buffer = infile.read()
-        with open(new_file, 'rb') as infile:
-            new_buffer = infile.read()
-        self.assertEqual(new_buffer, expected_buffer)
+        self.assertEqual(_digest(new_file), _digest(self.msdf))
 
     def test_split_into_two(self):
         cycles_per_pixel, cycles_per_scan = pseudodepths.divide(
@@ -129,17 +137,21 @@ class TestMsdf(unittest.TestCase):
         depth1 = os.path.join(self.tempdir, 'Depth1', 'Image.msdf')
         with open(depth0, 'rb') as infile:
             depth0_header = infile.read(pseudodepths.HEADER_SIZE)
-            depth0_sat = infile.read(NUM_PIXELS * pseudodepths.SAT_ENTRY_SIZE)
+            depth0_sat = np.frombuffer(
+                infile.read(NUM_PIXELS * pseudodepths.SAT_ENTRY_SIZE),
+                pseudodepths.SAT_DTYPE)
             depth0_data = infile.read()
         with open(depth1, 'rb') as infile:
             depth1_header = infile.read(pseudodepths.HEADER_SIZE)
-            depth1_sat = infile.read(NUM_PIXELS * pseudodepths.SAT_ENTRY_SIZE)
+            depth1_sat = np.frombuffer(
+                infile.read(NUM_PIXELS * pseudodepths.SAT_ENTRY_SIZE),
+                pseudodepths.SAT_DTYPE)
             depth1_data = infile.read()
 
         self.assertEqual(depth0_header, self.header)
         self.assertEqual(depth1_header, self.header)
-        self.assertEqual(depth0_sat, self._pack_sat(DEPTH0))
-        self.assertEqual(depth1_sat, self._pack_sat(DEPTH1))
+        npt.assert_array_equal(depth0_sat, self._build_sat(DEPTH0))
+        npt.assert_array_equal(depth1_sat, self._build_sat(DEPTH1))
         self.assertEqual(depth0_data, self._pack_data(DEPTH0))
         self.assertEqual(depth1_data, self._pack_data(DEPTH1))
 
@@ -149,5 +161,20 @@ class TestMsdf(unittest.TestCase):
         with self.assertRaises(ValueError):
             pseudodepths.divide(self.msdf, 3, self.tempdir)
 
+    def test_input_map_is_closed(self):
+        maps = []
+        mmap_class = mmap.mmap
+
+        def _mmap(*args, **kwargs):
+            maps.append(mmap_class(*args, **kwargs))
+            return maps[-1]
+
+        with patch.object(pseudodepths.mmap, 'mmap', side_effect=_mmap):
+            pseudodepths.divide(self.msdf, 2, self.tempdir)
+            with self.assertRaises(ValueError):
+                pseudodepths.divide(self.msdf, 3, self.tempdir)
+        self.assertEqual(len(maps), 2)
+        self.assertTrue(all(m.closed for m in maps))
+
 if __name__ == '__main__':
     unittest.main()
@@ -88,6 +88,33 @@ class TestRuns(unittest.TestCase):
         self.assertEqual(fovs, expected_fovs)
         self.assertEqual(calibration, expected_calibration)
 
+    def test_parse_xml_results_are_not_shared(self):
+        fovs, calibration = runs.parse_xml(self.xml)
+        fovs[0]['dwell'] = 0.
+        calibration['MassGain'] = 0.
+
+        fovs, calibration = runs.parse_xml(self.xml)
+
+        self.assertEqual(fovs[0]['dwell'], 4.)
+        self.assertEqual(calibration['MassGain'], 1.)
+
+    def test_parse_xml_cache_shares_linked_paths(self):
+        # pylint cannot see cache_info on the lru_cache wrapper.
+        # pylint: disable=no-value-for-parameter
+        link = os.path.join(self.test_dir, 'linked_run.xml')
+        os.symlink(self.xml, link)
+        self.addCleanup(os.remove, link)
+        fovs, _ = runs.parse_xml(self.xml)
+        hits = runs._parse_xml.cache_info().hits
+
+        linked_fovs, _ = runs.parse_xml(link)
+        relative_fovs, _ = runs.parse_xml(os.path.relpath(self.xml))
+
+        self.assertEqual(runs._parse_xml.cache_info().hits, hits + 2)
+        self.assertEqual(relative_fovs, fovs)
+        self.assertEqual(linked_fovs[0]['run'], 'linked_run')
+        self.assertEqual(fovs[0]['run'], 'run')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -5,7 +5,7 @@ Copyright (C) 2021 Ionpath, Inc.  All rights reserved."""
 import unittest
 
 import numpy as np
-from numpy.testing import assert_array_equal
+from numpy.testing import assert_allclose, assert_array_equal
 import pandas as pd
 import pandas.testing as pdt
 
@@ -158,6 +158,39 @@ class TestSegmentation(unittest.TestCase):
                                                         num_sectors=8)
         assert_array_equal(circ_secs, expected)
 
+    def test_axis_aligned_sectors(self):
+        # The center, then points on each axis and diagonal counterclockwise
+        # from the positive x-axis, each of which starts a new sector.
+        dx = np.array([0, 1, 1, 0, -1, -1, -1, 0, 1])
+        dy = np.array([0, 0, 1, 1, 1, 0, -1, -1, -1])
+        assert_array_equal(segmentation._axis_aligned_sectors(dx, dy, 4),
+                           [0, 0, 0, 1, 1, 2, 2, 3, 3])
+        assert_array_equal(segmentation._axis_aligned_sectors(dx, dy, 8),
+                           [0, 0, 1, 2, 3, 4, 5, 6, 7])
+
+    def test_circular_sectors_diagonal_pixel(self):
+        # The center is (8/3, 4/3), so the pixel at (3, 1) lies exactly on the
+        # 135 degree diagonal. Its floating point angle falls just short of
+        # it, which puts it in sector 2 on its own rather than in sector 3
+        # with the pixel at (3, 0).
+        data = np.zeros((4, 4, 1))
+        data[2, 3], data[3, 0], data[3, 1] = 2, 3, 5
+        image = mi.MibiImage(data, ['ch0'])
+        inds = ((2, 3, 3), (3, 0, 1))
+        secs = segmentation._angle_sectors(
+            np.array(inds[0]), np.array(inds[1]), np.mean(inds, axis=1), 8)
+        assert_array_equal(secs, [7, 3, 2])
+        octs = segmentation._circular_sectors_mean(inds, image, num_sectors=8)
+        assert_allclose(octs, [(2 * 3 * 5) ** (1 / 8)])
+
+    def test_circular_sectors_overflow(self):
+        # Four single-pixel quadrants whose product overflows float64.
+        data = np.full((3, 3, 1), 1e100)
+        image = mi.MibiImage(data, ['ch0'])
+        inds = ((0, 0, 2, 2), (0, 2, 0, 2))
+        quads = segmentation._circular_sectors_mean(inds, image, num_sectors=4)
+        assert_allclose(quads, [1e100])
+
 
     def test_extract_cell_dataframe(self):
         data = np.stack((
@@ -200,6 +233,12 @@ class TestSegmentation(unittest.TestCase):
         pdt.assert_frame_equal(
             segmentation.extract_cell_dataframe(cell_labels, image),
             pd.concat((expected_from_labels, expected_from_total), axis=1))
+        # Check mode 'total' keeps float32 sums
+        float_image = mi.MibiImage(data.astype(np.float32), ['1', '2'])
+        pdt.assert_frame_equal(
+            segmentation.extract_cell_dataframe(cell_labels, float_image),
+            pd.concat((expected_from_labels,
+                       expected_from_total.astype(np.float32)), axis=1))
         # Check mode 'quadrant'
         quads = []
         for label in labels:
@@ -264,6 +303,17 @@ class TestSegmentation(unittest.TestCase):
             segmentation.replace_labeled_pixels(cell_labels, df,
                                                 columns=['dsDNA']),
             mi.MibiImage(expected_data[:, :, [0]], ['dsDNA']))
+        # Labels absent from the dataframe are zeroed.
+        self.assertEqual(
+            segmentation.replace_labeled_pixels(cell_labels, df.loc[[3]]),
+            mi.MibiImage(
+                np.where(cell_labels[:, :, np.newaxis] == 3, expected_data, 0),
+                ['dsDNA', 'CD45']))
+        with self.assertRaises(IndexError):
+            segmentation.replace_labeled_pixels(
+                cell_labels, pd.DataFrame(
+                    [[100, 0]], columns=['dsDNA', 'CD45'],
+                    index=pd.Index([4], name='label')))
 
 
     def test_filter_by_size(self):
@@ -285,6 +335,26 @@ class TestSegmentation(unittest.TestCase):
         assert_array_equal(filtered_image, expected)
         pdt.assert_frame_equal(filtered_df, df)
 
+    def test_filter_by_size_uint64(self):
+        cell_labels = np.array([
+            [0, 1, 1, 2],
+            [1, 1, 3, 3],
+            [4, 4, 3, 3],
+            [0, 4, 3, 3]
+        ], dtype=np.uint64)
+        expected = np.array([
+            [0, 1, 1, 0],
+            [1, 1, 0, 0],
+            [2, 2, 0, 0],
+            [0, 2, 0, 0]
+        ], dtype=np.uint64)
+        df = segmentation.extract_cell_dataframe(expected)
+        filtered_image, filtered_df = segmentation.filter_by_size(
+            cell_labels, 3, 5)
+        self.assertEqual(filtered_image.dtype, np.uint64)
+        assert_array_equal(filtered_image, expected)
+        pdt.assert_frame_equal(filtered_df, df)
+
 
     def test_expand_objects(self):
         labels = np.array([
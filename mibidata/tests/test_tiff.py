@@ -3,6 +3,8 @@
 Copyright (C) 2021 Ionpath, Inc.  All rights reserved."""
 
 import datetime
+import functools
+import io
 import os
 import shutil
 import tempfile
@@ -10,18 +12,15 @@ import unittest
 import warnings
 
 import numpy as np
-from skimage import io as skio, img_as_ubyte, transform
+from skimage import io as skio
 from tifffile import TiffFile
 
 from mibidata import mibi_image as mi
 from mibidata import tiff, util
 
-DATA = np.arange(500).reshape(10, 10, 5).astype(np.float32)
+DATA_UINT16 = np.arange(500, dtype=np.uint16).reshape(10, 10, 5)
+DATA = DATA_UINT16.astype(np.float32)
 SED = np.arange(100).reshape(10, 10)
-CAROUSEL = np.random.randint(0, 255, (4096, 4096, 3), np.uint8)
-X_COORD, Y_COORD = tiff._BOTTOM_LABEL_COORDINATES
-LABEL = (img_as_ubyte(transform.rotate(
-    CAROUSEL[X_COORD[0]:X_COORD[1], Y_COORD[0]:Y_COORD[1]], 270)))
 CHANNELS = ((1, 'Target1'), (2, 'Target2'), (3, 'Target3'),
             (4, 'Target4'), (5, 'Target5'))
 CHANNELS_NON_ASCII = ((1, 'Targetµ'), (2, 'Targetβ'), (3, 'Targetγ'),
@@ -60,9 +59,27 @@ OLD_MIBISCOPE_METADATA = {
     'check_reg': False, 'filename': '20180703_1234_test',
     'description': 'test image',
 }
+# The date in all of the metadata above, as it is read back from a file.
+EXPECTED_DATE = datetime.datetime(2017, 9, 16, 15, 26)
 OLD_TIFF_FILE = os.path.join(os.path.dirname(__file__), 'data', 'v0.1.tiff')
 
 
+@functools.lru_cache(maxsize=1)
+def _carousel():
+    """A random optical image, only built for the tests that need it."""
+    rng = np.random.default_rng(0)
+    return np.frombuffer(
+        rng.bytes(4096 * 4096 * 3), np.uint8).reshape(4096, 4096, 3)
+
+
+@functools.lru_cache(maxsize=1)
+def _label():
+    """The slide label expected to be cropped from the optical image."""
+    x_coord, y_coord = tiff._BOTTOM_LABEL_COORDINATES
+    return np.rot90(
+        _carousel()[x_coord[0]:x_coord[1], y_coord[0]:y_coord[1]], k=-1)
+
+
 class TestTiffHelpers(unittest.TestCase):
 
     def test_motor_to_cm(self):
@@ -74,102 +91,115 @@ class TestTiffHelpers(unittest.TestCase):
 
 class TestWriteReadTiff(unittest.TestCase):
 
-    def setUp(self):
-        self.float_image = mi.MibiImage(DATA, CHANNELS, **METADATA)
-        self.float_image_non_ascii = mi.MibiImage(
+    @classmethod
+    def setUpClass(cls):
+        # The tests only write these images, so they are shared.
+        cls.float_image = mi.MibiImage(DATA, CHANNELS, **METADATA)
+        cls.float_image_non_ascii = mi.MibiImage(
             DATA, CHANNELS_NON_ASCII, **METADATA)
-        self.int_image = mi.MibiImage(
-            DATA.astype(np.uint16), CHANNELS, **METADATA)
-        self.image_user_defined_metadata = mi.MibiImage(DATA, CHANNELS,
-                                                        **METADATA,
-                                                        **USER_DEFINED_METADATA)
-        self.image_old_metadata = mi.MibiImage(
+        cls.int_image = mi.MibiImage(DATA_UINT16, CHANNELS, **METADATA)
+        cls.image_user_defined_metadata = mi.MibiImage(DATA, CHANNELS,
+                                                       **METADATA,
+                                                       **USER_DEFINED_METADATA)
+        cls.image_old_metadata = mi.MibiImage(
             DATA, CHANNELS, **OLD_METADATA)
-        self.image_old_mibiscope_metadata = mi.MibiImage(
+        cls.image_old_mibiscope_metadata = mi.MibiImage(
             DATA, CHANNELS, **OLD_MIBISCOPE_METADATA)
-        self.folder = tempfile.mkdtemp()
-        self.filename = os.path.join(self.folder, 'test.tiff')
+        # Encoded once for the tests that only exercise reading.
+        buffer = io.BytesIO()
+        tiff.write(buffer, cls.float_image)
+        cls.float_tiff = buffer.getvalue()
+        cls.folder = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.folder)
+
+    def setUp(self):
+        self.filename = os.path.join(
+            self.folder, f'{self._testMethodName}.tiff')
         self.maxDiff = None
 
-    def tearDown(self):
-        shutil.rmtree(self.folder)
+    def _float_file(self):
+        """A new file object holding the encoded float image."""
+        return io.BytesIO(self.float_tiff)
 
     def test_current_software_version(self):
         self.assertEqual(tiff.SOFTWARE_VERSION, 'IonpathMIBIv1.0')
 
     def test_sims_only(self):
-        tiff.write(self.filename, self.float_image)
-        image = tiff.read(self.filename)
-        self.assertEqual(image, self.float_image)
-        sims, sed, optical, label = tiff.read(self.filename, sed=True,
+        buffer = io.BytesIO()
+        tiff.write(buffer, self.float_image)
+        buffer.seek(0)
+        sims, sed, optical, label = tiff.read(buffer, sed=True,
                                               optical=True, label=True)
         self.assertEqual(sims, self.float_image)
         self.assertIsNone(sed)
         self.assertIsNone(optical)
         self.assertIsNone(label)
-        self.assertEqual(image.data.dtype, np.float32)
+        self.assertEqual(sims.data.dtype, np.float32)
 
     def test_sims_selected_masses(self):
-        tiff.write(self.filename, self.float_image)
-        image = tiff.read(self.filename, masses=self.float_image.masses[1:3])
-        expected_image = tiff.read(self.filename).slice_image(CHANNELS[1:3])
+        image = tiff.read(self._float_file(),
+                          masses=self.float_image.masses[1:3])
+        expected_image = tiff.read(
+            self._float_file()).slice_image(CHANNELS[1:3])
         self.assertEqual(expected_image, image)
 
     def test_sims_selected_targets(self):
-        tiff.write(self.filename, self.float_image)
-        image = tiff.read(self.filename, targets=self.float_image.targets[1:3])
-        expected_image = tiff.read(self.filename).slice_image(CHANNELS[1:3])
+        image = tiff.read(self._float_file(),
+                          targets=self.float_image.targets[1:3])
+        expected_image = tiff.read(
+            self._float_file()).slice_image(CHANNELS[1:3])
         self.assertEqual(expected_image, image)
 
     def test_sims_selected_masses_and_targets(self):
-        tiff.write(self.filename, self.float_image)
         with self.assertRaises(ValueError):
-            tiff.read(self.filename, masses=self.float_image.masses[1:2],
+            tiff.read(self._float_file(),
+                      masses=self.float_image.masses[1:2],
                       targets=self.float_image.targets[2:3])
 
     def test_sims_extra_masses(self):
-        tiff.write(self.filename, self.float_image)
         with warnings.catch_warnings(record=True) as warns:
-            image = tiff.read(self.filename, masses=[1, 2, 6])
-        expected_image = tiff.read(self.filename).slice_image([1, 2])
+            image = tiff.read(self._float_file(), masses=[1, 2, 6])
+        expected_image = tiff.read(self._float_file()).slice_image([1, 2])
         self.assertEqual(expected_image, image)
         messages = [str(w.message) for w in warns]
         self.assertTrue('Requested masses not found in file: [6]' in messages)
 
     def test_sims_extra_targets(self):
-        tiff.write(self.filename, self.float_image)
         target = self.float_image.targets[1]
 
         with warnings.catch_warnings(record=True) as warns:
-            image = tiff.read(self.filename, targets=['Target0', target])
-        expected_image = tiff.read(self.filename).slice_image([target])
+            image = tiff.read(self._float_file(), targets=['Target0', target])
+        expected_image = tiff.read(self._float_file()).slice_image([target])
         self.assertEqual(expected_image, image)
         messages = [str(w.message) for w in warns]
         self.assertTrue('Requested targets not found in file: [\'Target0\']'
                         in messages)
 
     def test_sims_no_selected_found(self):
-        tiff.write(self.filename, self.float_image)
         with self.assertRaises(ValueError):
-            tiff.read(self.filename, targets=['do', 'not', 'exist'])
+            tiff.read(self._float_file(), targets=['do', 'not', 'exist'])
 
     def test_default_ranges(self):
-        tiff.write(self.filename, self.float_image)
-        with TiffFile(self.filename) as tif:
-            for i, page in enumerate(tif.pages):
-                self.assertEqual(page.tags['SMinSampleValue'].value, 0)
-                self.assertEqual(page.tags['SMaxSampleValue'].value,
-                                 self.float_image.data[:, :, i].max())
+        maxes = self.float_image.data.max(axis=(0, 1))
+        with TiffFile(self._float_file()) as tif:
+            ranges = [(page.tags['SMinSampleValue'].value,
+                       page.tags['SMaxSampleValue'].value)
+                      for page in tif.pages]
+        self.assertEqual(ranges, [(0, m) for m in maxes])
 
     def test_custom_ranges(self):
         ranges = list(zip([1]*5, range(2, 7)))
-        tiff.write(self.filename, self.float_image, ranges=ranges)
-        with TiffFile(self.filename) as tif:
-            for i, page in enumerate(tif.pages):
-                self.assertEqual(page.tags['SMinSampleValue'].value,
-                                 ranges[i][0])
-                self.assertEqual(page.tags['SMaxSampleValue'].value,
-                                 ranges[i][1])
+        buffer = io.BytesIO()
+        tiff.write(buffer, self.float_image, ranges=ranges)
+        buffer.seek(0)
+        with TiffFile(buffer) as tif:
+            written = [(page.tags['SMinSampleValue'].value,
+                        page.tags['SMaxSampleValue'].value)
+                       for page in tif.pages]
+        self.assertEqual(written, ranges)
 
 
     def test_sims_and_sed(self):
@@ -184,13 +214,15 @@ class TestWriteReadTiff(unittest.TestCase):
         self.assertIsNone(label)
 
     def test_sims_and_sed_and_optical_and_label(self):
-        tiff.write(self.filename, self.float_image, sed=SED, optical=CAROUSEL)
-        image, sed, optical, label = tiff.read(self.filename, sed=True,
+        buffer = io.BytesIO()
+        tiff.write(buffer, self.float_image, sed=SED, optical=_carousel())
+        buffer.seek(0)
+        image, sed, optical, label = tiff.read(buffer, sed=True,
                                                optical=True, label=True)
         self.assertEqual(image, self.float_image)
         np.testing.assert_array_equal(sed, SED)
-        np.testing.assert_array_equal(optical, CAROUSEL)
-        np.testing.assert_array_equal(label, LABEL)
+        np.testing.assert_array_equal(optical, _carousel())
+        np.testing.assert_array_equal(label, _label())
 
     def test_read_sed_only(self):
         tiff.write(self.filename, self.float_image, sed=SED)
@@ -198,17 +230,21 @@ class TestWriteReadTiff(unittest.TestCase):
         np.testing.assert_array_equal(sed, SED)
 
     def test_read_optical_and_label_only(self):
-        tiff.write(self.filename, self.float_image, optical=CAROUSEL)
-        optical, label = tiff.read(self.filename, sims=False,
+        buffer = io.BytesIO()
+        tiff.write(buffer, self.float_image, optical=_carousel())
+        buffer.seek(0)
+        optical, label = tiff.read(buffer, sims=False,
                                    optical=True, label=True)
-        np.testing.assert_array_equal(optical, CAROUSEL)
-        np.testing.assert_array_equal(label, LABEL)
+        np.testing.assert_array_equal(optical, _carousel())
+        np.testing.assert_array_equal(label, _label())
 
-        optical_only = tiff.read(self.filename, sims=False, optical=True)
-        np.testing.assert_array_equal(optical_only, CAROUSEL)
+        buffer.seek(0)
+        optical_only = tiff.read(buffer, sims=False, optical=True)
+        np.testing.assert_array_equal(optical_only, _carousel())
 
-        label_only = tiff.read(self.filename, sims=False, label=True)
-        np.testing.assert_array_equal(label_only, LABEL)
+        buffer.seek(0)
+        label_only = tiff.read(buffer, sims=False, label=True)
+        np.testing.assert_array_equal(label_only, _label())
 
     def test_write_invalid_input(self):
         # not MibiImage
@@ -240,18 +276,15 @@ class TestWriteReadTiff(unittest.TestCase):
             tiff.read(self.filename)
 
     def test_read_with_invalid_return_types(self):
-        tiff.write(self.filename, self.float_image)
         with self.assertRaises(ValueError):
-            tiff.read(self.filename, sims=False)
+            tiff.read(self._float_file(), sims=False)
 
     def test_read_metadata_only(self):
-        tiff.write(self.filename, self.float_image)
-        metadata = tiff.info(self.filename)
+        metadata = tiff.info(self._float_file())
         expected = METADATA.copy()
         expected.update({
             'conjugates': list(CHANNELS),
-            'date': datetime.datetime.strptime(expected['date'],
-                                               '%Y-%m-%dT%H:%M:%S')})
+            'date': EXPECTED_DATE})
         self.assertEqual(metadata, expected)
 
     def test_read_metadata_with_user_defined_metadata(self):
@@ -260,8 +293,7 @@ class TestWriteReadTiff(unittest.TestCase):
         expected = METADATA.copy()
         expected.update({
             'conjugates': list(CHANNELS),
-            'date': datetime.datetime.strptime(expected['date'],
-                                               '%Y-%m-%dT%H:%M:%S'),
+            'date': EXPECTED_DATE,
             **USER_DEFINED_METADATA})
         self.assertEqual(metadata, expected)
 
@@ -272,8 +304,7 @@ class TestWriteReadTiff(unittest.TestCase):
         expected.update({
             'point_name': OLD_METADATA['point_name'],
             'conjugates': list(CHANNELS),
-            'date': datetime.datetime.strptime(expected['date'],
-                                               '%Y-%m-%dT%H:%M:%S'),
+            'date': EXPECTED_DATE,
             'description': None, 'version': None})
         self.assertEqual(metadata, expected)
 
@@ -284,8 +315,7 @@ class TestWriteReadTiff(unittest.TestCase):
         expected.update({
             'conjugates': list(CHANNELS),
             'aperture': 'B',
-            'date': datetime.datetime.strptime(expected['date'],
-                                               '%Y-%m-%dT%H:%M:%S'),
+            'date': EXPECTED_DATE,
         })
         self.assertEqual(metadata, expected)
 
@@ -295,8 +325,7 @@ class TestWriteReadTiff(unittest.TestCase):
         expected.update({
             'conjugates': list(CHANNELS),
             'aperture': 'B',
-            'date': datetime.datetime.strptime(expected['date'],
-                                               '%Y-%m-%dT%H:%M:%S'),
+            'date': EXPECTED_DATE,
         })
         del expected['description']
         del expected['version']
@@ -316,8 +345,7 @@ class TestWriteReadTiff(unittest.TestCase):
         # Unordered indices: [2, 0, 4, 1, 3]
         unordered_channels = ((3, 'Target3'), (1, 'Target1'), (5, 'Target5'),
                               (2, 'Target2'), (4, 'Target4'))
-        unordered_data = np.stack([DATA[:, :, 2], DATA[:, :, 0], DATA[:, :, 4],
-                                   DATA[:, :, 1], DATA[:, :, 3]], axis=2)
+        unordered_data = DATA[:, :, [2, 0, 4, 1, 3]]
         unordered_image = mi.MibiImage(unordered_data, unordered_channels,
                                        **METADATA)
 
@@ -375,61 +403,32 @@ class TestWriteReadTiff(unittest.TestCase):
         with self.assertRaises(ValueError):
             tiff.write(self.filename, self.float_image, write_float=False)
 
-    def test_write_float32_from_float32_tiff_dtype_none(self):
-        tiff.write(self.filename, self.float_image, multichannel=True)
-        image = tiff.read(self.filename)
-        self.assertEqual(image.data.dtype, np.float32)
-        np.testing.assert_equal(
-            image.data, self.float_image.data.astype(np.float32))
+    def test_write_dtype_conversions(self):
+        # (source image, requested dtype, expected data read back)
+        cases = [
+            (self.float_image, None, DATA),
+            (self.float_image, np.float32, DATA),
+            (self.int_image, np.float32, DATA),
+            (self.int_image, None, DATA_UINT16),
+            (self.int_image, np.uint16, DATA_UINT16),
+            (self.float_image, np.uint16, DATA_UINT16),
+        ]
+        for source, dtype, expected in cases:
+            with self.subTest(source=source.data.dtype, dtype=dtype):
+                tiff.write(self.filename, source, multichannel=True,
+                           dtype=dtype)
+                image = tiff.read(self.filename)
+                self.assertEqual(image.data.dtype, expected.dtype)
+                np.testing.assert_equal(image.data, expected)
 
     def test_write_float32_from_float32_tiff_dtype_none_non_ascii(self):
         tiff.write(self.filename, self.float_image_non_ascii, multichannel=True)
         image = tiff.read(self.filename)
         self.assertEqual(image.data.dtype, np.float32)
-        np.testing.assert_equal(
-            image.data, self.float_image_non_ascii.data.astype(np.float32))
+        np.testing.assert_equal(image.data, DATA)
         np.testing.assert_equal(
             image.channels, self.float_image_non_ascii.channels)
 
-    def test_write_float32_from_float32_dtype_np_float32(self):
-        tiff.write(self.filename, self.float_image, multichannel=True,
-                   dtype=np.float32)
-        image = tiff.read(self.filename)
-        self.assertEqual(image.data.dtype, np.float32)
-        np.testing.assert_equal(
-            image.data, self.float_image.data.astype(np.float32))
-
-    def test_write_float32_from_int_dtype_np_float32(self):
-        tiff.write(self.filename, self.int_image, multichannel=True,
-                   dtype=np.float32)
-        image = tiff.read(self.filename)
-        self.assertEqual(image.data.dtype, np.float32)
-        np.testing.assert_equal(
-            image.data, self.float_image.data.astype(np.float32))
-
-    def test_write_uint16_from_uint16_dtype_none(self):
-        tiff.write(self.filename, self.int_image, multichannel=True)
-        image = tiff.read(self.filename)
-        self.assertEqual(image.data.dtype, np.uint16)
-        np.testing.assert_equal(
-            image.data, self.float_image.data.astype(np.uint16))
-
-    def test_write_uint16_from_uint16_dtype_np_uint16(self):
-        tiff.write(self.filename, self.int_image, multichannel=True,
-                   dtype=np.uint16)
-        image = tiff.read(self.filename)
-        self.assertEqual(image.data.dtype, np.uint16)
-        np.testing.assert_equal(
-            image.data, self.float_image.data.astype(np.uint16))
-
-    def test_write_uint16_from_float32_dtype_np_uint16(self):
-        tiff.write(self.filename, self.float_image, multichannel=True,
-                   dtype=np.uint16)
-        image = tiff.read(self.filename)
-        self.assertEqual(image.data.dtype, np.uint16)
-        np.testing.assert_equal(
-            image.data, self.float_image.data.astype(np.uint16))
-
     def test_write_float32_as_uint16_fails(self):
         lossy_image = mi.MibiImage(DATA + 0.001, CHANNELS, **METADATA)
         with self.assertRaises(ValueError):
@@ -445,8 +444,9 @@ class TestWriteReadTiff(unittest.TestCase):
         self.assertEqual(image.data.dtype, np.float32)
 
     def test_write_uint16_from_uint8(self):
+        rng = np.random.default_rng(0)
         uint8_image = mi.MibiImage(
-            np.random.randint(0, 256, (32, 32, 5), dtype=np.uint8),
+            rng.integers(0, 256, (10, 10, 5), dtype=np.uint8),
             CHANNELS, **METADATA)
         tiff.write(self.filename, uint8_image, multichannel=True)
         image = tiff.read(self.filename)
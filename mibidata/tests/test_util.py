@@ -2,6 +2,7 @@
 
 Copyright (C) 2021 Ionpath, Inc.  All rights reserved."""
 
+import datetime
 import unittest
 import numpy as np
 from numpy.testing import assert_array_equal
@@ -65,6 +66,22 @@ class TestUtil(unittest.TestCase):
         self.assertListEqual(formatted_names, expected_names)
 
 
+    def test_parse_datetime(self):
+        datetime_format = '%Y-%m-%dT%H:%M:%S'
+        self.assertEqual(
+            util.parse_datetime('2017-09-16T15:26:00', datetime_format),
+            datetime.datetime(2017, 9, 16, 15, 26))
+        # Not in ISO 8601 form, but accepted by strptime.
+        self.assertEqual(
+            util.parse_datetime('2017-9-16T15:26:00', datetime_format),
+            datetime.datetime(2017, 9, 16, 15, 26))
+        for date in ('2017-09-16', '2017-09-16 15:26:00',
+                     '2017-09-16T15:26:00.5', '2017-09-16T15:26:00+05:00',
+                     '2017-09-16T15:26+05'):
+            with self.subTest(date=date):
+                with self.assertRaises(ValueError):
+                    util.parse_datetime(date, datetime_format)
+
     def test_car2pol(self):
 
         x_c, y_c = 0, 0
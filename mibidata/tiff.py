@@ -52,8 +52,9 @@ def write(filename, image, sed=None, optical=None, ranges=None,
     """Writes MIBI data to a multipage TIFF.
 
     Args:
-        filename: The path to the target file if multi-channel, or the path to
-            a folder if single-channel.
+        filename: The path to, or a writable binary file object for, the
+            target file if multi-channel, or the path to a folder if
+            single-channel.
         image: A :class:`mibidata.mibi_image.MibiImage` instance.
         sed: Optional, an array of the SED image data. This is assumed to be
             grayscale even if 3-dimensional, in which case only one channel
@@ -121,8 +122,12 @@ def write(filename, image, sed=None, optical=None, ranges=None,
         save_dtype = np.uint16
         range_dtype = 'I'
 
-    to_save = image.data.astype(save_dtype)
-    if not np.all(np.equal(to_save, image.data)):
+    # MibiImage stores its data channel-major and astype keeps that layout, so
+    # each page written below is a contiguous slice. Data that is already in
+    # the target dtype is written as-is, without a copy or a lossless check.
+    data = image.data
+    to_save = data.astype(save_dtype, copy=False)
+    if to_save.dtype != data.dtype and not np.array_equal(to_save, data):
         raise ValueError('Cannot convert data from '
                          f'{image.data.dtype} to {save_dtype}')
 
@@ -291,7 +296,9 @@ def read(file, sims=True, sed=False, optical=False, label=False,
         if (targets or masses) and not sims_data:
             raise ValueError('None of the channels specified for inclusion '
                              'are present in file.')
-        image = mi.MibiImage(np.stack(sims_data, axis=2), channels, **metadata)
+        # Stacking channels first matches the MibiImage memory layout.
+        image = mi.MibiImage(np.stack(sims_data).transpose(1, 2, 0),
+                             channels, **metadata)
         if masses:
             missing_masses = list(set(masses) - set(image.masses))
             if missing_masses:
@@ -412,7 +419,7 @@ def info(filename):
     """Gets the metadata from a MIBItiff file.
 
     Args:
-        filename: The path to the TIFF.
+        filename: The string path or an open file object to a MIBItiff file.
 
     Returns:
         A dictionary of metadata as could be supplied as kwargs to
@@ -2,6 +2,7 @@
 
 Copyright (C) 2021 Ionpath, Inc.  All rights reserved."""
 
+import datetime
 import re
 import functools
 import numpy as np
@@ -113,6 +114,32 @@ def format_for_filename(label):
     return label
 
 
+def parse_datetime(date, datetime_format):
+    """Parses a date string, as datetime.datetime.strptime does.
+
+    Strings in ISO 8601 form are parsed with the faster
+    datetime.datetime.fromisoformat, but only when the result formats back to
+    the same string, so that exactly the strings strptime accepts are accepted.
+
+    Args:
+        date: The date string.
+        datetime_format: The strptime format of the date string.
+
+    Returns:
+        The parsed datetime.datetime.
+
+    Raises:
+        ValueError: Raised if the string does not match the format.
+    """
+    try:
+        parsed = datetime.datetime.fromisoformat(date)
+        if parsed.strftime(datetime_format) == date:
+            return parsed
+    except ValueError:
+        pass
+    return datetime.datetime.strptime(date, datetime_format)
+
+
 def car2pol(x, y, x_c=0, y_c=0, degrees=False):
     """Convert cartesian to polar coordinates w.r.t. a central point.
     Angle phi is returned in the range [0, 2 pi) rad. A flag can be activated